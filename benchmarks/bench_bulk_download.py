@@ -0,0 +1,157 @@
+"""
+Bulk data updates against a local stand-in for the Scryfall bulk data
+endpoints: a first download, an unchanged file (304), a download cut off
+half way and resumed (206), a resume after the file changed on the server
+(If-Range mismatch, full 200), a partial file that was already complete,
+and one the server refuses to resume (416). Reports the bytes each update
+moved and the statuses the server answered with.
+
+Run from the repository root:
+    python -m benchmarks.bench_bulk_download [cards]
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+
+import requests
+
+from database import CardDatabase
+from services.data_updater import DataUpdater
+from benchmarks.bench_import import make_bulk_file
+from benchmarks.stand_in_server import StandInServer
+
+class BulkDataServer(StandInServer):
+    """
+    Serves /bulk-data and the oracle cards file at /oracle-cards.json with an
+    ETag, honoring Range/If-Range and If-None-Match. cut_after makes the next
+    download stop after that many bytes; announce_size=False leaves the size
+    out of /bulk-data.
+    """
+
+    def __init__(self, body):
+        self.cut_after = None
+        self.announce_size = True
+        self.sent = 0
+        self.statuses = []
+        self.lock = threading.Lock()
+        self.set_body(body, "2026-01-01T00:00:00+00:00")
+        super().__init__()
+
+    def set_body(self, body, updated_at):
+        self.body = body
+        self.updated_at = updated_at
+        self.etag = '"' + hashlib.md5(body).hexdigest() + '"'
+
+    def handle(self, request):
+        if request.path == "/bulk-data":
+            item = {'type': 'oracle_cards', 'updated_at': self.updated_at,
+                    'download_uri': self.url + "/oracle-cards.json"}
+            if self.announce_size:
+                item['size'] = len(self.body)
+            self.reply_json(request, 200, {'object': 'list', 'data': [item]})
+            return
+
+        headers = {'ETag': self.etag, 'Content-Type': 'application/json'}
+        body = self.body
+        status = 200
+        byte_range = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+        if request.headers.get('If-None-Match') == self.etag:
+            status, body = 304, b''
+        elif byte_range and (not if_range or if_range == self.etag):
+            start = int(byte_range.split('=')[1].rstrip('-'))
+            if start >= len(self.body):
+                status, body = 416, b''
+                headers['Content-Range'] = f"bytes */{len(self.body)}"
+            else:
+                status, body = 206, self.body[start:]
+                headers['Content-Range'] = f"bytes {start}-{len(self.body) - 1}/{len(self.body)}"
+        with self.lock:
+            self.statuses.append(status)
+
+        if self.cut_after is None or not body:
+            self.reply(request, status, body, headers)
+            self.sent += len(body)
+            return
+        # Announce the whole body, then drop the connection part way through
+        request.send_response(status)
+        for key, value in headers.items():
+            request.send_header(key, value)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body[:self.cut_after])
+        request.wfile.flush()
+        self.sent += self.cut_after
+        self.cut_after = None
+        request.close_connection = True
+
+def main(argv):
+    count = int(argv[0]) if len(argv) > 0 else 5000
+    body = make_bulk_file(count)
+    server = BulkDataServer(body)
+    print(f"{count} cards, {len(body) / 1e6:.1f} MB bulk file")
+    print(f"  {'update':<26} {'result':<7} {'sent':>10} {'cards':>6}  statuses")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = CardDatabase(os.path.join(workdir, "cards.db"))
+        updater = DataUpdater(db, requests.Session(), bulk_data_url=server.url + "/bulk-data",
+                              state_file=os.path.join(workdir, "bulk_data.json"),
+                              download_path=os.path.join(workdir, "cards.json.part"))
+        part = updater.download_path
+
+        def run(label, expect_success=True):
+            server.sent = 0
+            server.statuses = []
+            result = []
+            updater._run_update_db(lambda *args: None, lambda success, message: result.append(success))
+            ok = result == [expect_success]
+            print(f"  {label:<26} {'ok' if ok else 'FAILED':<7} {server.sent:10d} {db.count():6d}  "
+                  f"{' '.join(str(status) for status in server.statuses) or '-'}")
+
+        run("first download")
+
+        # Scryfall republished the same file
+        server.set_body(body, "2026-01-02T00:00:00+00:00")
+        run("unchanged (304)")
+
+        # Connection dropped half way, then the next update resumes it
+        changed = make_bulk_file(count, seed=1)
+        server.set_body(changed, "2026-01-03T00:00:00+00:00")
+        server.cut_after = len(changed) // 2
+        run("cut off half way", expect_success=False)
+        run("resumed (206)")
+
+        # The file changed between the cut-off download and the retry
+        server.set_body(make_bulk_file(count, seed=2), "2026-01-04T00:00:00+00:00")
+        server.cut_after = len(server.body) // 3
+        run("cut off a third of the way", expect_success=False)
+        server.set_body(make_bulk_file(count, seed=3), server.updated_at)
+        run("file changed (If-Range)")
+
+        # Downloaded completely, but the app closed before the import finished
+        state = updater.load_state()
+        server.set_body(make_bulk_file(count, seed=4), "2026-01-05T00:00:00+00:00")
+        with open(part, "wb") as f:
+            f.write(server.body)
+        state['partial'] = {'download_uri': server.url + "/oracle-cards.json", 'etag': server.etag}
+        updater.save_state(state)
+        run("already downloaded")
+
+        # Same, but without a size to compare: the server answers 416
+        server.announce_size = False
+        server.set_body(make_bulk_file(count, seed=5), "2026-01-06T00:00:00+00:00")
+        with open(part, "wb") as f:
+            f.write(server.body)
+        state = updater.load_state()
+        state['partial'] = {'download_uri': server.url + "/oracle-cards.json", 'etag': server.etag}
+        updater.save_state(state)
+        run("complete, no size (416)")
+        print(f"  partial file left behind: {os.path.exists(part)}")
+        db.close()
+
+    server.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,116 @@
+"""
+Image-style downloads from a local stand-in server with fixed latency: the
+old serial loop (one request after another), one thread per request, and
+the FetchEngine. Reports the time taken and the most threads alive at once,
+then cancels a large batch half way.
+
+Run from the repository root:
+    python -m benchmarks.bench_fetch_engine [downloads] [latency ms]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import wait
+
+import requests
+
+from services.fetch_engine import FetchEngine
+from benchmarks.stand_in_server import StandInServer
+
+class ImageServer(StandInServer):
+    """Answers every GET with a 60 KB "image" after a fixed delay."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        super().__init__()
+
+    def handle(self, request):
+        time.sleep(self.latency)
+        self.reply(request, 200, b"\xff" * 60000, {'Content-Type': 'image/jpeg'})
+
+class ThreadPeak:
+    """Samples threading.active_count() in the background (minus its own thread)."""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self.running = True
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+
+    def _sample(self):
+        while self.running:
+            self.peak = max(self.peak, threading.active_count() - 1)
+            time.sleep(0.005)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        return self.peak
+
+def save(session, url, path):
+    response = session.get(url, timeout=30)
+    if response.status_code == 200:
+        with open(path, "wb") as f:
+            f.write(response.content)
+
+def main(argv):
+    count = int(argv[0]) if len(argv) > 0 else 300
+    latency = (int(argv[1]) if len(argv) > 1 else 50) / 1000
+    server = ImageServer(latency)
+    urls = [f"{server.url}/normal/front/{i}.jpg" for i in range(count)]
+    print(f"{count} downloads, {latency * 1000:.0f} ms per request")
+    print(f"  {'method':<20} {'time':>7} {'threads':>8} {'files':>6}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        def run(label, method):
+            target = os.path.join(workdir, label.replace(' ', '_'))
+            os.makedirs(target)
+            session = requests.Session()
+            peak = ThreadPeak()
+            start = time.perf_counter()
+            method(session, [(url, os.path.join(target, f"{i}.jpg")) for i, url in enumerate(urls)])
+            elapsed = time.perf_counter() - start
+            print(f"  {label:<20} {elapsed:6.2f}s {peak.stop():8d} {len(os.listdir(target)):6d}")
+
+        def serial(session, jobs):
+            for url, path in jobs:
+                save(session, url, path)
+
+        def thread_per_request(session, jobs):
+            threads = [threading.Thread(target=save, args=(session, url, path), daemon=True) for url, path in jobs]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        def engine(session, jobs):
+            fetch_engine = FetchEngine(session)
+            wait([fetch_engine.download(url, path) for url, path in jobs])
+            fetch_engine.close()
+
+        run("serial", serial)
+        run("thread per request", thread_per_request)
+        run("fetch engine", engine)
+
+        # Cancel everything still queued after a short while
+        target = os.path.join(workdir, "cancelled")
+        os.makedirs(target)
+        fetch_engine = FetchEngine(requests.Session())
+        server.requests = 0
+        futures = [fetch_engine.download(url, os.path.join(target, f"{i}.jpg")) for i, url in enumerate(urls)]
+        time.sleep(count * latency / 12)
+        start = time.perf_counter()
+        cancelled = sum(1 for future in futures if future.cancel())
+        wait(futures)
+        time.sleep(latency * 2)
+        print(f"  cancelled {cancelled}/{count} in {(time.perf_counter() - start) * 1000:.0f} ms; "
+              f"{server.requests} requests made, {len(os.listdir(target))} files, "
+              f"{sum(1 for name in os.listdir(target) if name.endswith('.part'))} partial")
+        fetch_engine.close()
+
+    server.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,209 @@
+"""
+Per-card search filter cost: the original filter, which re-read the filters
+dict for every card, against the compiled CardFilter, over every card in a
+synthetic database.
+
+Run from the repository root:
+    python -m benchmarks.bench_filters [card count]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+from database import CardDatabase
+from services.card_filters import CardFilter
+from services.data_updater import iter_json_array
+from benchmarks.bench_import import make_bulk_file
+
+UB_SETS_CONFIG = [
+    ("Warhammer 40,000", "ub_40k", ["40k"]),
+    ("Lord of the Rings", "ub_lotr", ["ltr", "ltc"]),
+    ("Doctor Who", "ub_who", ["who"]),
+    ("Fallout", "ub_fallout", ["pip"]),
+    ("Assassin's Creed", "ub_acr", ["acr"]),
+    ("Transformers", "ub_bot", ["bot"]),
+    ("Jurassic World", "ub_rex", ["rex"]),
+    ("Dungeons & Dragons", "ub_dnd", ["afr", "afc", "clb"]),
+    ("Final Fantasy", "ub_ff", ["fin", "fic"]),
+    ("Marvel", "ub_marvel", ["mar"]),
+]
+
+FILTER_SETS = {
+    "prefs only": {'prefs': {}},
+    "commander identity": {'commander_identity': ['B', 'G'], 'prefs': {}},
+    "type + subtype + cmc": {'type': 'Creature', 'subtype': 'Elf, Druid', 'cmc': '<=3', 'prefs': {}},
+    "text + colors": {'colors': ['U', 'R'], 'text': 'draw card', 'prefs': {}},
+    "universes beyond off": {'prefs': {'ub_lotr': False, 'ub_40k': False, 'ub_other': False}},
+}
+
+def _legacy_check_cmc(card_cmc, filter_str):
+    try:
+        filter_str = filter_str.strip()
+        if filter_str.startswith(">="):
+            return card_cmc >= float(filter_str[2:])
+        elif filter_str.startswith("<="):
+            return card_cmc <= float(filter_str[2:])
+        elif filter_str.startswith(">"):
+            return card_cmc > float(filter_str[1:])
+        elif filter_str.startswith("<"):
+            return card_cmc < float(filter_str[1:])
+        elif filter_str.startswith("="):
+            return card_cmc == float(filter_str[1:])
+        return card_cmc == float(filter_str)
+    except ValueError:
+        return True
+
+def legacy_matches(card, filters, ub_sets_config):
+    """The per-card filter SearchService used before CardFilter (comments trimmed)."""
+    prefs = filters.get('prefs', {})
+
+    known_ub_sets = set()
+    ub_key_map = {}
+    for _, key, codes in ub_sets_config:
+        for c in codes:
+            known_ub_sets.add(c)
+            ub_key_map[c] = key
+
+    if 'commander_identity' in filters:
+        card_id = set(card.get('color_identity', []))
+        cmd_id = set(filters['commander_identity'])
+        if not card_id.issubset(cmd_id):
+            return False
+
+    if 'colors' in filters:
+        card_id = set(card.get('color_identity', []))
+        selected_id = set(filters['colors'])
+        if not card_id.issubset(selected_id):
+            return False
+
+    if 'type' in filters:
+        t_filter = filters['type'].lower()
+        t_line = card.get('type_line', '').lower()
+        if 'card_faces' in card:
+            match = False
+            for face in card['card_faces']:
+                if t_filter in face.get('type_line', '').lower():
+                    match = True
+                    break
+            if not match and t_filter not in t_line:
+                return False
+        else:
+            if t_filter not in t_line:
+                return False
+
+    if 'subtype' in filters:
+        subtypes = [s.strip().lower() for s in filters['subtype'].split(',') if s.strip()]
+        t_line = card.get('type_line', '').lower()
+        match_all = True
+        for s_filter in subtypes:
+            if 'card_faces' in card:
+                face_match = False
+                for face in card['card_faces']:
+                    if s_filter in face.get('type_line', '').lower():
+                        face_match = True
+                        break
+                if not face_match and s_filter not in t_line:
+                    match_all = False
+                    break
+            else:
+                if s_filter not in t_line:
+                    match_all = False
+                    break
+        if not match_all:
+            return False
+
+    if 'cmc' in filters:
+        if not _legacy_check_cmc(card.get('cmc', 0), filters['cmc']):
+            return False
+
+    if 'text' in filters:
+        words = filters['text'].lower().split()
+        oracle_text = card.get('oracle_text', '').lower()
+        if 'card_faces' in card:
+            combined_text = " ".join([face.get('oracle_text', '').lower() for face in card['card_faces']])
+            for w in words:
+                if w not in combined_text:
+                    return False
+        else:
+            for w in words:
+                if w not in oracle_text:
+                    return False
+
+    if not prefs.get('include_alchemy', False):
+        if 'paper' not in card.get('games', []):
+            return False
+    if not prefs.get('include_silver', False):
+        if card.get('border_color') == 'silver':
+            return False
+    if not prefs.get('include_playtest', False):
+        if card.get('set_type') == 'memorabilia' or 'playtest' in card.get('promo_types', []):
+            return False
+    if not prefs.get('include_oversized', False):
+        if card.get('oversized', False):
+            return False
+    if not prefs.get('include_funny', False):
+        if card.get('set_type') == 'funny':
+            return False
+
+    is_ub = False
+    if card.get('security_stamp') == 'triangle':
+        is_ub = True
+    card_set = card.get('set', '').lower()
+    excluded_ub = False
+    if card_set in ub_key_map:
+        is_ub = True
+        key = ub_key_map[card_set]
+        if not prefs.get(key, True):
+            excluded_ub = True
+    if excluded_ub:
+        return False
+    if is_ub and card_set not in known_ub_sets:
+        if not prefs.get('ub_other', True):
+            return False
+
+    return True
+
+def load_cards(count, workdir):
+    path = os.path.join(workdir, "filters.db")
+    db = CardDatabase(path, build_indexes=False)
+    db.bulk_import_raw(iter_json_array(io.BytesIO(make_bulk_file(count)), with_raw=True))
+    db.build_indexes()
+    # Decode everything up front so only the filters are timed
+    cards = [card.copy() for card in db.get_all_cards_generator()]
+    return db, cards
+
+def main(argv):
+    count = int(argv[0]) if argv else 30000
+    with tempfile.TemporaryDirectory() as workdir:
+        db, cards = load_cards(count, workdir)
+        print(f"{len(cards)} cards")
+        print(f"  {'filters':<22} {'legacy':>10} {'compiled':>10} {'speedup':>8} {'sql scan':>9}")
+        for label, filters in FILTER_SETS.items():
+            start = time.perf_counter()
+            legacy = sum(1 for card in cards if legacy_matches(card, filters, UB_SETS_CONFIG))
+            legacy_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            card_filter = CardFilter.compile(filters, UB_SETS_CONFIG)
+            compiled = sum(1 for card in cards if card_filter.matches(card))
+            compiled_time = time.perf_counter() - start
+
+            if legacy != compiled:
+                print(f"  {label}: MISMATCH legacy {legacy} vs compiled {compiled}")
+
+            # Same filters in SQL over the whole table
+            where, params = card_filter.to_sql()
+            start = time.perf_counter()
+            with db._reader() as conn:
+                conn.execute(f"SELECT COUNT(*) FROM cards WHERE {where or '1'}", params).fetchone()
+            sql_time = time.perf_counter() - start
+
+            per_card = lambda seconds: f"{seconds / len(cards) * 1e9:7.0f} ns"
+            print(f"  {label:<22} {per_card(legacy_time):>10} {per_card(compiled_time):>10} "
+                  f"{legacy_time / compiled_time:7.1f}x {sql_time * 1000:6.1f} ms")
+        db.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
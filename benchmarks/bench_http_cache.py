@@ -0,0 +1,100 @@
+"""
+Repeat API requests through the on-disk HTTP cache, against a local
+stand-in server with Scryfall-like latency: a plain session, cached
+responses under a TTL override, and responses that have to be revalidated
+(ETag, 304) every time. Ends with a small cache to show LRU eviction.
+
+Run from the repository root:
+    python -m benchmarks.bench_http_cache [distinct urls] [repeats] [latency ms]
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+from services.http_cache import HttpCache, install_http_cache
+from benchmarks.stand_in_server import StandInServer
+
+class RevalidatingServer(StandInServer):
+    """Answers every GET with a ~20 KB JSON page, an ETag and Cache-Control: no-cache."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.full = 0
+        self.not_modified = 0
+        super().__init__()
+
+    def handle(self, request):
+        time.sleep(self.latency)
+        body = json.dumps({'object': 'list', 'path': request.path,
+                           'data': [{'name': f"Card {i}", 'oracle_text': "Draw a card. " * 10}
+                                    for i in range(100)]}).encode('utf-8')
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            self.reply(request, 304, headers={'ETag': etag})
+            return
+        self.full += 1
+        self.reply(request, 200, body, {'Content-Type': 'application/json; charset=utf-8',
+                                        'ETag': etag, 'Cache-Control': 'no-cache'})
+
+def run(session, urls, repeats):
+    """Returns (seconds for the first pass, average seconds per request on repeats)."""
+    start = time.perf_counter()
+    first = [session.get(url).json() for url in urls]
+    first_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for url, expected in zip(urls, first):
+            if session.get(url).json() != expected:
+                print(f"  MISMATCH for {url}")
+    return first_time, (time.perf_counter() - start) / (repeats * len(urls))
+
+def main(argv):
+    count = int(argv[0]) if len(argv) > 0 else 20
+    repeats = int(argv[1]) if len(argv) > 1 else 5
+    latency = (int(argv[2]) if len(argv) > 2 else 80) / 1000
+
+    server = RevalidatingServer(latency)
+    urls = [f"{server.url}/cards/search?q=oracleid:{i}&unique=prints" for i in range(count)]
+    print(f"{count} urls x {repeats} repeats, {latency * 1000:.0f} ms per request")
+    print(f"  {'session':<14} {'first pass':>10} {'repeat avg':>11} {'200s':>5} {'304s':>5} {'hit ratio':>9}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [
+            ("plain", None),
+            ("ttl override", {server.url + '/cards/search': 600}),
+            ("revalidate", {}),
+        ]
+        for label, ttls in cases:
+            server.full = server.not_modified = 0
+            session = requests.Session()
+            cache = None
+            if ttls is not None:
+                cache = HttpCache(os.path.join(workdir, f"{label}.db"), ttls=ttls)
+                install_http_cache(session, cache, limits={})
+            first_time, repeat_time = run(session, urls, repeats)
+            ratio = f"{cache.stats()['hit_ratio']:.2f}" if cache else "-"
+            print(f"  {label:<14} {first_time * 1000:8.0f}ms {repeat_time * 1000:9.2f}ms "
+                  f"{server.full:5d} {server.not_modified:5d} {ratio:>9}")
+            if cache:
+                cache.close()
+
+        # Room for about a quarter of the pages: the oldest get evicted
+        cache = HttpCache(os.path.join(workdir, "small.db"), max_bytes=count * 21000 // 4,
+                          ttls={server.url: 600})
+        session = install_http_cache(requests.Session(), cache, limits={})
+        run(session, urls, 1)
+        stats = cache.stats()
+        print(f"  bounded cache: {stats['entries']} entries, {stats['bytes']} bytes "
+              f"(max {cache.max_bytes}), {stats['evictions']} evictions")
+        cache.close()
+
+    server.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,105 @@
+"""
+Bulk import benchmark on synthetic Scryfall-like card data.
+
+Run from the repository root:
+    python -m benchmarks.bench_import [card counts...]
+"""
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from database import CardDatabase
+from services.data_updater import iter_json_array
+
+WORDS = ("dragon goblin elf angel sol ring lightning bolt counter spell wrath god "
+         "urza saga forest island swamp mountain plains fire ice knight storm lord vault").split()
+TEXT_WORDS = WORDS + "draw card flying haste destroy target creature enters battlefield".split()
+TYPES = ["Creature — Elf Druid", "Creature — Goblin", "Legendary Creature — Dragon", "Instant",
+         "Sorcery", "Artifact", "Enchantment — Aura", "Land", "Legendary Planeswalker — Jace"]
+SETS = ["m21", "ltr", "40k", "who", "sld", "unf", "clb", "dom", "afr", "cmm"]
+
+def make_card(i, rnd):
+    name = " ".join(rnd.choice(WORDS).title() for _ in range(rnd.randint(1, 3))) + f" {i}"
+    identity = [c for c in "WUBRG" if rnd.random() < 0.25]
+    card = {
+        "object": "card", "id": f"id-{i}", "oracle_id": f"oracle-{i}", "name": name,
+        "lang": "en", "layout": "normal",
+        "image_uris": {"small": f"https://cards.scryfall.io/small/front/{i}.jpg",
+                       "normal": f"https://cards.scryfall.io/normal/front/{i}.jpg"},
+        "mana_cost": "{1}{G}", "cmc": float(rnd.randint(0, 8)), "type_line": rnd.choice(TYPES),
+        "oracle_text": " ".join(rnd.choice(TEXT_WORDS) for _ in range(20)),
+        "colors": identity, "color_identity": identity,
+        "legalities": {"commander": rnd.choice(["legal", "banned", "not_legal"])},
+        "games": rnd.choice([["paper", "mtgo"], ["arena"], ["paper"]]), "set": rnd.choice(SETS),
+        "set_type": rnd.choice(["expansion", "funny", "memorabilia", "commander"]),
+        "border_color": rnd.choice(["black", "black", "silver"]), "oversized": rnd.random() < 0.05,
+        "promo_types": rnd.choice([[], ["playtest"], ["boosterfun"]]), "rarity": "rare",
+    }
+    if i % 50 == 0:
+        back = rnd.choice(WORDS).title() + f" Back {i}"
+        card["card_faces"] = [
+            {"name": name, "type_line": "Instant", "oracle_text": "Draw a card."},
+            {"name": back, "type_line": "Sorcery — Arcane", "oracle_text": "Flying"},
+        ]
+        card["name"] = f"{name} // {back}"
+        del card["oracle_text"]
+    return card
+
+def make_bulk_file(count, seed=0):
+    rnd = random.Random(seed)
+    # Compact separators like the Scryfall bulk files
+    cards = [make_card(i, rnd) for i in range(count)]
+    return json.dumps(cards, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def remove_db(path):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def bench(count, workdir):
+    raw = make_bulk_file(count)
+    entries = lambda: iter_json_array(io.BytesIO(raw), with_raw=True)
+    print(f"{count} cards ({len(raw) / 1e6:.1f} MB)")
+
+    # Fresh database without indexes, indexed afterwards (the updater's shadow build)
+    path = os.path.join(workdir, f"shadow_{count}.db")
+    remove_db(path)
+    db = CardDatabase(path, build_indexes=False)
+    _, load = timed(lambda: db.bulk_import_raw(entries()))
+    _, index = timed(db.build_indexes)
+    db.close()
+    report("shadow build", count, load + index, f"load {load:.2f}s + indexes {index:.2f}s, "
+                                                f"{os.path.getsize(path) / 1e6:.1f} MB on disk")
+
+    # Empty indexed database (first run): indexes are dropped and rebuilt
+    path = os.path.join(workdir, f"live_{count}.db")
+    remove_db(path)
+    db = CardDatabase(path)
+    _, elapsed = timed(lambda: db.bulk_import_raw(entries()))
+    report("in place", count, elapsed)
+
+    # Same data again: everything is skipped by the payload hash check
+    _, elapsed = timed(lambda: db.bulk_import_raw(entries()))
+    report("unchanged", count, elapsed)
+    db.close()
+
+def report(label, count, elapsed, detail=""):
+    print(f"  {label:<14} {elapsed:6.2f}s  {count / elapsed:9.0f} cards/s  {detail}")
+
+def main(argv):
+    counts = [int(a) for a in argv] or [30000, 90000]
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in counts:
+            bench(count, workdir)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
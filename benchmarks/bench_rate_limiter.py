@@ -0,0 +1,94 @@
+"""
+Shared rate limiting against a local stand-in server that throttles like
+Scryfall (429 with Retry-After above 10 requests per second). Bulk threads
+download in the background while an interactive thread makes occasional
+requests; compares a plain session with the rate limited one.
+
+Run from the repository root:
+    python -m benchmarks.bench_rate_limiter [bulk threads] [requests per thread]
+"""
+import sys
+import threading
+import time
+
+import requests
+
+from services.rate_limiter import install_rate_limiter, request_priority, TokenBucket, BULK
+from benchmarks.stand_in_server import StandInServer
+
+class ThrottlingServer(StandInServer):
+    """Answers every GET after a short delay, or 429 once clients go over `rate` per second."""
+
+    def __init__(self, rate, latency=0.01):
+        self.bucket = TokenBucket(rate, burst=rate)
+        self.latency = latency
+        self.ok = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+        super().__init__()
+
+    def handle(self, request):
+        with self.bucket._cond:
+            allowed = self.bucket._time_to_token() <= 0
+            if allowed:
+                self.bucket.tokens -= 1
+        with self.lock:
+            if allowed:
+                self.ok += 1
+            else:
+                self.throttled += 1
+        time.sleep(self.latency)
+        if allowed:
+            self.reply(request, 200, b'{}')
+        else:
+            self.reply(request, 429, b'{}', {'Retry-After': '1'})
+
+def run(session, url, bulk_threads, per_thread, bulk_priority):
+    failed = []
+    latencies = []
+
+    def bulk():
+        with request_priority(bulk_priority):
+            for i in range(per_thread):
+                if session.get(f"{url}/bulk/{i}").status_code != 200:
+                    failed.append(i)
+
+    threads = [threading.Thread(target=bulk) for _ in range(bulk_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    # Someone searching while the download runs
+    while any(thread.is_alive() for thread in threads):
+        request_start = time.perf_counter()
+        if session.get(f"{url}/search").status_code != 200:
+            failed.append('search')
+        latencies.append(time.perf_counter() - request_start)
+        time.sleep(0.25)
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, failed
+
+def main(argv):
+    bulk_threads = int(argv[0]) if len(argv) > 0 else 4
+    per_thread = int(argv[1]) if len(argv) > 1 else 25
+    print(f"{bulk_threads} bulk threads x {per_thread} requests, server allows 10 per second")
+    print(f"  {'session':<22} {'total':>7} {'ok':>5} {'429s':>5} {'failed':>7} {'search avg':>11} {'max':>7}")
+
+    cases = [
+        ("plain", None, BULK),
+        ("limited, no priority", {'127.0.0.1': (10, 2)}, 0),
+        ("limited, bulk priority", {'127.0.0.1': (10, 2)}, BULK),
+    ]
+    for label, limits, bulk_priority in cases:
+        server = ThrottlingServer(10)
+        session = requests.Session()
+        if limits:
+            install_rate_limiter(session, limits)
+        total, latencies, failed = run(session, server.url, bulk_threads, per_thread, bulk_priority)
+        average = sum(latencies) / len(latencies) if latencies else 0
+        print(f"  {label:<22} {total:6.2f}s {server.ok:5d} {server.throttled:5d} {len(failed):7d} "
+              f"{average * 1000:9.0f}ms {max(latencies, default=0) * 1000:5.0f}ms")
+        server.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
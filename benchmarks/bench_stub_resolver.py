@@ -0,0 +1,208 @@
+"""
+Stub resolution against a local stand-in for the Scryfall API: the original
+one-request-per-card flow (exact, then fuzzy on a 404) against StubResolver,
+which batches the names through /cards/collection. Then clicks a missing
+card while an imported deck is still being resolved, and resolves a deck
+of misspelled local names with Scryfall unreachable.
+
+Run from the repository root:
+    python -m benchmarks.bench_stub_resolver [card count] [missing count] [latency ms]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from database import CardDatabase, normalize_name
+from services.stub_resolver import StubResolver, SELECTED, DECK
+from services.rate_limiter import install_rate_limiter
+from benchmarks.bench_import import make_card
+from benchmarks.stand_in_server import StandInServer
+
+class ScryfallStandIn(StandInServer):
+    """Answers /cards/collection and /cards/named from a list of cards, after a fixed delay."""
+
+    def __init__(self, cards, latency):
+        self.by_key = {normalize_name(card['name']): card for card in cards}
+        self.latency = latency
+        super().__init__()
+
+    def handle(self, request):
+        time.sleep(self.latency)
+        if request.command == 'POST':
+            found = []
+            not_found = []
+            for identifier in self.read_json(request)['identifiers']:
+                card = self.by_key.get(normalize_name(identifier['name']))
+                if card:
+                    found.append(card)
+                else:
+                    not_found.append(identifier)
+            self.reply_json(request, 200, {'object': 'list', 'not_found': not_found, 'data': found})
+            return
+
+        params = parse_qs(urlparse(request.path).query)
+        if 'exact' in params:
+            card = self.by_key.get(normalize_name(params['exact'][0]))
+        else:
+            card = self.fuzzy(params['fuzzy'][0])
+        if card:
+            self.reply_json(request, 200, card)
+        else:
+            self.reply_json(request, 404, {'object': 'error', 'code': 'not_found'})
+
+    def fuzzy(self, name):
+        # Good enough for the typos below: a stray letter after the name
+        key = normalize_name(name)
+        for card_key, card in self.by_key.items():
+            if card_key.startswith(key) or key.startswith(card_key):
+                return card
+        return None
+
+def legacy_resolve(db, session, api_base, stub):
+    """The stub fetch MainWindow ran per card before StubResolver (UI callback dropped)."""
+    name = stub['name']
+    if db.get_card(name):
+        return False
+    response = session.get(f"{api_base}/cards/named", params={'exact': name})
+    if response.status_code == 200:
+        db.save_card(response.json())
+        return True
+    if response.status_code == 404:
+        response = session.get(f"{api_base}/cards/named", params={'fuzzy': name})
+        if response.status_code == 200:
+            db.save_card(response.json())
+            return True
+    return False
+
+def make_stubs(cards, missing, rnd):
+    stubs = []
+    for i, card in enumerate(cards):
+        name = card['name']
+        # A few of the missing cards come back from EDHREC with a typo
+        if i >= len(cards) - missing and i % 10 == 0:
+            name += "x"
+        stubs.append({'name': name, 'is_stub': True})
+    rnd.shuffle(stubs)
+    return stubs
+
+def main(argv):
+    count = int(argv[0]) if len(argv) > 0 else 100
+    missing = int(argv[1]) if len(argv) > 1 else 60
+    latency = (int(argv[2]) if len(argv) > 2 else 20) / 1000
+
+    rnd = random.Random(0)
+    cards = [make_card(i, rnd) for i in range(count)]
+    server = ScryfallStandIn(cards, latency)
+    print(f"{count} stubs, {missing} missing locally, {latency * 1000:.0f} ms per request")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Original flow: one card at a time, 100 ms pause after each API hit
+        db = CardDatabase(os.path.join(workdir, "legacy.db"))
+        db.save_cards(cards[:count - missing])
+        session = requests.Session()
+        stubs = make_stubs(cards, missing, random.Random(1))
+        server.requests = 0
+        start = time.perf_counter()
+        for stub in stubs:
+            if legacy_resolve(db, session, server.url, stub):
+                time.sleep(0.1)
+        legacy_time = time.perf_counter() - start
+        print(f"  {'legacy':<14} {legacy_time:6.2f} s {server.requests:5d} requests {db.count():6d} cards")
+        db.close()
+
+        db = CardDatabase(os.path.join(workdir, "batched.db"))
+        db.save_cards(cards[:count - missing])
+        resolved = []
+        done = threading.Event()
+        stubs = make_stubs(cards, missing, random.Random(1))
+
+        def on_resolved(stub, card):
+            resolved.append(stub)
+            if len(resolved) == len(stubs):
+                done.set()
+
+        # Same 10 requests per second the app allows for api.scryfall.com
+        session = install_rate_limiter(requests.Session(), {'127.0.0.1': (10, 2)})
+        resolver = StubResolver(db, session, on_resolved, api_base=server.url)
+        server.requests = 0
+        start = time.perf_counter()
+        for stub in stubs:
+            resolver.resolve(stub)
+        done.wait(60)
+        batched_time = time.perf_counter() - start
+        print(f"  {'batched':<14} {batched_time:6.2f} s {server.requests:5d} requests {db.count():6d} cards"
+              f"  ({len(resolved)}/{len(stubs)} resolved)")
+        db.close()
+
+        # A deck import of missing cards (with duplicate stubs, like basic
+        # lands) is queued when the user clicks another missing card
+        db = CardDatabase(os.path.join(workdir, "click.db"))
+        extra = [make_card(i, rnd) for i in range(count, count + 300)]
+        server.by_key.update((normalize_name(card['name']), card) for card in extra)
+        clicked = {'name': extra[-1]['name'], 'is_stub': True}
+        resolved_at = {}
+        deck_resolved = []
+        all_done = threading.Event()
+        deck = [{'name': card['name'], 'is_stub': True} for card in extra[:-1]]
+        deck += [{'name': extra[0]['name'], 'is_stub': True} for _ in range(30)]
+
+        def on_click_resolved(stub, card):
+            if stub is clicked:
+                resolved_at['click'] = time.perf_counter()
+            else:
+                deck_resolved.append(stub)
+            if len(deck_resolved) == len(deck) and 'click' in resolved_at:
+                all_done.set()
+
+        session = install_rate_limiter(requests.Session(), {'127.0.0.1': (10, 2)})
+        resolver = StubResolver(db, session, on_click_resolved, api_base=server.url)
+        server.requests = 0
+        for stub in deck:
+            resolver.resolve(stub, DECK)
+        time.sleep(0.3)
+        start = time.perf_counter()
+        resolver.resolve(clicked, SELECTED)
+        all_done.wait(60)
+        print(f"  click during a {len(deck)}-stub import: resolved in "
+              f"{(resolved_at.get('click', start) - start) * 1000:.0f} ms, "
+              f"{len(deck_resolved)}/{len(deck)} deck stubs in {server.requests} requests")
+        db.close()
+
+        # Offline: every name has a one-letter typo, the cards are all local
+        db = CardDatabase(os.path.join(workdir, "offline.db"))
+        db.save_cards(cards[:40])
+        typo_stubs = []
+        for card in cards[:40]:
+            name = card['name']
+            drop = rnd.randrange(len(name.split(' ')[0]))
+            typo_stubs.append({'name': name[:drop] + name[drop + 1:], 'is_stub': True, 'expected': name})
+        offline_resolved = []
+        offline_done = threading.Event()
+
+        def on_offline_resolved(stub, card):
+            offline_resolved.append(card['name'] == stub['expected'])
+            if len(offline_resolved) == len(typo_stubs):
+                offline_done.set()
+
+        unreachable = StandInServer()
+        unreachable.close()
+        session = install_rate_limiter(requests.Session(), {'127.0.0.1': (10, 2)})
+        resolver = StubResolver(db, session, on_offline_resolved, api_base=unreachable.url)
+        start = time.perf_counter()
+        for stub in typo_stubs:
+            resolver.resolve(stub, DECK)
+        offline_done.wait(30)
+        print(f"  offline, {len(typo_stubs)} typos: {time.perf_counter() - start:.2f} s, "
+              f"{sum(offline_resolved)}/{len(typo_stubs)} resolved to the right card")
+        db.close()
+
+    server.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,69 @@
+"""
+Local HTTP server standing in for Scryfall-like APIs in the benchmarks.
+Subclass StandInServer and answer requests in handle().
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StandInServer:
+    """
+    Serves on a free 127.0.0.1 port from a background thread; url is the
+    base URL. handle(request) gets the BaseHTTPRequestHandler for every GET
+    and POST and answers it with reply() or reply_json(). requests counts
+    the requests handled.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._dispatch(self)
+
+            def do_POST(self):
+                server._dispatch(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def _dispatch(self, request):
+        with self._lock:
+            self.requests += 1
+        self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    @staticmethod
+    def read_json(request):
+        return json.loads(request.rfile.read(int(request.headers['Content-Length'])))
+
+    @staticmethod
+    def reply(request, status, body=b'', headers=None):
+        request.send_response(status)
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        if body:
+            request.wfile.write(body)
+
+    @classmethod
+    def reply_json(cls, request, status, payload, headers=None):
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+        cls.reply(request, status, json.dumps(payload).encode('utf-8'), headers)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,143 +1,1164 @@
 import sqlite3
 import json
+import re
+import difflib
+import hashlib
+import itertools
+import queue
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+# Columns extracted from the card JSON so searches can filter in SQL.
+# List-valued fields are stored comma-delimited with leading/trailing commas
+# (",paper,mtgo,") so a single LIKE '%,paper,%' tests membership.
+CARD_COLUMNS = [
+    ('type_line', "TEXT"),
+    ('color_identity', "TEXT NOT NULL DEFAULT ''"),
+    # Color identity as bits (see color_mask), so subset checks are one AND
+    ('color_mask', "INTEGER NOT NULL DEFAULT 0"),
+    ('cmc', "REAL NOT NULL DEFAULT 0"),
+    ('set_code', "TEXT NOT NULL DEFAULT ''"),
+    ('set_type', "TEXT NOT NULL DEFAULT ''"),
+    ('games', "TEXT NOT NULL DEFAULT ''"),
+    ('border_color', "TEXT NOT NULL DEFAULT ''"),
+    ('security_stamp', "TEXT NOT NULL DEFAULT ''"),
+    ('oversized', "INTEGER NOT NULL DEFAULT 0"),
+    ('promo_types', "TEXT NOT NULL DEFAULT ''"),
+    ('type_lines', "TEXT NOT NULL DEFAULT ''"),
+    ('oracle_text', "TEXT NOT NULL DEFAULT ''"),
+    # Normalized names (see normalize_name) for case/punctuation-insensitive lookups
+    ('name_key', "TEXT NOT NULL DEFAULT ''"),
+    ('face_key', "TEXT NOT NULL DEFAULT ''"),
+    # 1 if the card's own type_line, cmc, color_identity and set equal the
+    # columns above, so Card can answer them without the payload
+    ('hot_exact', "INTEGER NOT NULL DEFAULT 0"),
+]
+
+CARD_INDEXES = [
+    ('idx_cards_color_identity', 'color_identity'),
+    ('idx_cards_cmc', 'cmc'),
+    ('idx_cards_set_code', 'set_code'),
+    ('idx_cards_set_type', 'set_type'),
+    ('idx_cards_name_key', 'name_key'),
+    ('idx_cards_face_key', 'face_key'),
+]
+
+# Upsert rather than INSERT OR REPLACE so the full-text index triggers see
+# an UPDATE (REPLACE deletes rows without firing delete triggers).
+_ROW_COLUMNS = ['json_data', 'payload_hash'] + [col for col, _ in CARD_COLUMNS]
+_INSERT_SQL = "INSERT INTO cards (name, {}) VALUES ({}) ON CONFLICT(name) DO UPDATE SET {}".format(
+    ", ".join(_ROW_COLUMNS),
+    ", ".join("?" * (len(_ROW_COLUMNS) + 1)),
+    ", ".join(f"{col} = excluded.{col}" for col in _ROW_COLUMNS))
+
+# Full-text index over name, type lines and oracle text, kept in sync with
+# the cards table by triggers.
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+           name, type_lines, oracle_text,
+           content='cards', content_rowid='rowid',
+           tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards BEGIN
+           INSERT INTO cards_fts(rowid, name, type_lines, oracle_text)
+           VALUES (new.rowid, new.name, new.type_lines, new.oracle_text);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards BEGIN
+           INSERT INTO cards_fts(cards_fts, rowid, name, type_lines, oracle_text)
+           VALUES ('delete', old.rowid, old.name, old.type_lines, old.oracle_text);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS cards_fts_update AFTER UPDATE ON cards BEGIN
+           INSERT INTO cards_fts(cards_fts, rowid, name, type_lines, oracle_text)
+           VALUES ('delete', old.rowid, old.name, old.type_lines, old.oracle_text);
+           INSERT INTO cards_fts(rowid, name, type_lines, oracle_text)
+           VALUES (new.rowid, new.name, new.type_lines, new.oracle_text);
+       END""",
+]
+
+def fts_query(text, column):
+    """
+    Builds an FTS5 MATCH expression restricted to one column.
+    Bare words become prefix matches ("drag" finds "Dragon"), "quoted text"
+    becomes a phrase match. All terms must match.
+    Returns None if the text contains nothing searchable.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        tokens = re.findall(r'\w+', phrase or word)
+        if not tokens:
+            continue
+        term = '"' + ' '.join(tokens) + '"'
+        if word:
+            term += '*'
+        terms.append(term)
+    if not terms:
+        return None
+    return f"{column} : ({' AND '.join(terms)})"
+
+_QUOTES_RE = re.compile(r"['\u2019`\"]")
+_PUNCTUATION_RE = re.compile(r'[\W_]+')
+
+def normalize_name(name):
+    """
+    Normalizes a card name for lookups: casefolded, accents stripped,
+    apostrophes/quotes removed and other punctuation collapsed to single spaces.
+    "Lim-Dûl's Vault" -> "lim duls vault", "Fire // Ice" -> "fire ice"
+    """
+    if not name.isascii():
+        name = unicodedata.normalize('NFKD', name)
+        name = ''.join(ch for ch in name if not unicodedata.combining(ch))
+        name = name.replace('æ', 'ae').replace('Æ', 'AE')
+    name = _QUOTES_RE.sub('', name.casefold())
+    return _PUNCTUATION_RE.sub(' ', name).strip()
+
+COLOR_BITS = {'W': 1, 'U': 2, 'B': 4, 'R': 8, 'G': 16}
+ALL_COLORS_MASK = 31
+
+def color_mask(colors):
+    """Color letters (e.g. ['W', 'U']) as a 5-bit mask: W=1 U=2 B=4 R=8 G=16."""
+    mask = 0
+    for color in colors:
+        mask |= COLOR_BITS.get(color, 0)
+    return mask
+
+def _list_column(values):
+    if not values:
+        return ''
+    return ',' + ','.join(values) + ','
+
+def card_columns(card):
+    """Returns the values for CARD_COLUMNS extracted from a card dict."""
+    faces = card.get('card_faces', [])
+
+    type_line = card.get('type_line', '')
+    if not type_line and faces:
+        type_line = faces[0].get('type_line', '')
+
+    # Whole card type line plus every face, one per line, for type/subtype filters
+    type_lines = [card.get('type_line', '')] + [face.get('type_line', '') for face in faces]
+
+    identity = card.get('color_identity', [])
+    identity_column = ''.join(c for c in 'WUBRG' if c in identity)
+    name = card.get('name') or ''
+    cmc = card.get('cmc', 0) or 0
+    set_code = card.get('set', '').lower()
+
+    # Two-faced cards without a top-level type_line, cards without a cmc etc.
+    # get column values the card itself doesn't have
+    hot_exact = ('type_line' in card and card['type_line'] == type_line
+                 and 'cmc' in card and card['cmc'] == cmc
+                 and list(identity_column) == card.get('color_identity')
+                 and card.get('set') == set_code)
+
+    return (
+        type_line,
+        identity_column,
+        color_mask(identity),
+        cmc,
+        set_code,
+        card.get('set_type', ''),
+        _list_column(card.get('games', [])),
+        card.get('border_color', '') or '',
+        card.get('security_stamp', '') or '',
+        1 if card.get('oversized', False) else 0,
+        _list_column(card.get('promo_types', [])),
+        '\n'.join(t for t in type_lines if t),
+        '\n'.join(face.get('oracle_text', '') for face in faces) if faces else card.get('oracle_text', ''),
+        normalize_name(name),
+        # Front face of split/double-faced cards, so "Fire" finds "Fire // Ice"
+        normalize_name(name.split(' // ')[0]),
+        1 if hot_exact else 0,
+    )
+
+def payload_hash(json_text):
+    """Fingerprint of a stored card payload, used to skip unchanged cards on import."""
+    return hashlib.blake2b(json_text.encode('utf-8'), digest_size=16).hexdigest()
+
+# Preset dictionary for payload compression: fragments shared by most
+# Scryfall card objects (in the compact formatting of the bulk data files),
+# so even a single small card compresses well.
+# zlib matches closer (later) dictionary bytes more cheaply, so the most
+# common fragments go last. Stored payloads can only be decompressed with the
+# exact same bytes: never edit this, it would make existing databases unreadable.
+_PAYLOAD_ZDICT = "".join([
+    '"flavor_text":"', '"watermark":"', '"produced_mana":[', '"all_parts":[',
+    '"loyalty":"', '"power":"', '"toughness":"', '"edhrec_rank":',
+    '"penny_rank":', '"card_back_id":"', '"illustration_id":"', '"artist_ids":["',
+    '"frame_effects":[', '"promo_types":[', '"security_stamp":"oval",',
+    '"purchase_uris":{"tcgplayer":"https://partner.tcgplayer.com/c/4931599/1830156/21018?subId1=api&u=https%3A%2F%2Fwww.tcgplayer.com%2Fproduct%2F',
+    '","cardmarket":"https://www.cardmarket.com/en/Magic/Products/Search?referrer=scryfall&searchString=',
+    '&utm_campaign=card_prices&utm_medium=text&utm_source=scryfall",',
+    '"cardhoarder":"https://www.cardhoarder.com/cards/', '?affiliate_id=scryfall&ref=card-profile&utm_campaign=affiliate&utm_medium=card&utm_source=scryfall"},',
+    '"related_uris":{"gatherer":"https://gatherer.wizards.com/Pages/Card/Details.aspx?multiverseid=',
+    '","tcgplayer_infinite_articles":"https://tcgplayer.pxf.io/c/4931599/1830156/21018?subId1=api&trafcat=infinite&u=https%3A%2F%2Finfinite.tcgplayer.com%2Fsearch%3FcontentMode%3Darticle%26game%3Dmagic%26partner%3Dscryfall%26q%3D',
+    '","tcgplayer_infinite_decks":"https://tcgplayer.pxf.io/c/4931599/1830156/21018?subId1=api&trafcat=infinite&u=https%3A%2F%2Finfinite.tcgplayer.com%2Fsearch%3FcontentMode%3Ddeck%26game%3Dmagic%26partner%3Dscryfall%26q%3D',
+    '","edhrec":"https://edhrec.com/route/?cc=',
+    '"prices":{"usd":"', '","usd_foil":"', '","usd_etched":null,"eur":"', '","eur_foil":"', '","tix":"',
+    '"legalities":{"standard":"not_legal","future":"not_legal","historic":"not_legal",'
+    '"timeless":"legal","gladiator":"not_legal","pioneer":"not_legal","explorer":"not_legal",'
+    '"modern":"legal","legacy":"legal","pauper":"not_legal","vintage":"legal",'
+    '"penny":"not_legal","commander":"legal","oathbreaker":"legal","standardbrawl":"not_legal",'
+    '"brawl":"not_legal","alchemy":"not_legal","paupercommander":"not_legal","duel":"legal",'
+    '"oldschool":"not_legal","premodern":"not_legal","predh":"not_legal"},',
+    '"games":["paper","arena","mtgo"],"reserved":false,"foil":true,"nonfoil":true,'
+    '"finishes":["nonfoil","foil"],"oversized":false,"promo":false,"reprint":true,'
+    '"variation":false,"set_id":"', '","set":"', '","set_name":"', '","set_type":"expansion",',
+    '"set_uri":"https://api.scryfall.com/sets/', '"set_search_uri":"https://api.scryfall.com/cards/search?order=set&q=e%3A',
+    '&unique=prints","scryfall_set_uri":"https://scryfall.com/sets/', '"rulings_uri":"https://api.scryfall.com/cards/',
+    '/rulings","prints_search_uri":"https://api.scryfall.com/cards/search?order=released&q=oracleid%3A',
+    '"collector_number":"', '","digital":false,"rarity":"common","rarity":"uncommon","rarity":"rare",',
+    '"artist":"', '"border_color":"black","frame":"2015","full_art":false,"textless":false,'
+    '"booster":true,"story_spotlight":false,',
+    '"highres_image":true,"image_status":"highres_scan","image_uris":{"small":"https://cards.scryfall.io/small/front/',
+    '.jpg?', '","normal":"https://cards.scryfall.io/normal/front/', '","large":"https://cards.scryfall.io/large/front/',
+    '","png":"https://cards.scryfall.io/png/front/', '.png?', '","art_crop":"https://cards.scryfall.io/art_crop/front/',
+    '","border_crop":"https://cards.scryfall.io/border_crop/front/', '"card_faces":[{"object":"card_face",',
+    '"mana_cost":"{', '}{', '"cmc":', '.0,"type_line":"', 'Legendary Creature \u2014 ', 'Creature \u2014 ',
+    'Instant', 'Sorcery', 'Artifact', 'Enchantment', 'Land', 'Planeswalker',
+    '"oracle_text":"', 'When ', ' enters the battlefield, ', 'target creature', ' you control', 'Flying', 'Draw a card.',
+    '"colors":[', '"color_identity":[', '"keywords":[', '"W"', '"U"', '"B"', '"R"', '"G"',
+    '"layout":"normal",', '"highres_image":', '"uri":"https://api.scryfall.com/cards/',
+    '","scryfall_uri":"https://scryfall.com/card/', '?utm_source=api",',
+    '{"object":"card","id":"', '","oracle_id":"', '","multiverse_ids":[', '"mtgo_id":', '"arena_id":',
+    '"tcgplayer_id":', '"cardmarket_id":', '"name":"', '","lang":"en","released_at":"',
+]).encode('utf-8')
+
+# Compressor primed with the dictionary; copied per payload so the
+# dictionary isn't processed again for every card
+_PAYLOAD_COMPRESSOR = zlib.compressobj(6, zlib.DEFLATED, 15, 8, zlib.Z_DEFAULT_STRATEGY, _PAYLOAD_ZDICT)
+
+def compress_payload(json_text):
+    """Compresses a card's JSON text for storage."""
+    compressor = _PAYLOAD_COMPRESSOR.copy()
+    return compressor.compress(json_text.encode('utf-8')) + compressor.flush()
+
+def decode_payload(json_data):
+    """
+    Decodes a stored card payload into the card dict.
+    Accepts compressed payloads and plain JSON text from older databases.
+    """
+    if isinstance(json_data, bytes):
+        decompressor = zlib.decompressobj(15, _PAYLOAD_ZDICT)
+        json_data = decompressor.decompress(json_data) + decompressor.flush()
+    return json.loads(json_data)
+
+class Card(MutableMapping):
+    """
+    Card dict backed by a stored row. The HOT_FIELDS used by list views are
+    read from table columns; the full payload is only decompressed and
+    parsed the first time anything else is accessed or the card is modified.
+    Cards whose payload differs from those columns (see hot_exact) only
+    answer the name without it, so values never change once decoded.
+    copy() returns a plain dict.
+    """
+    __slots__ = ('_hot', '_payload', '_data')
+
+    HOT_FIELDS = ('name', 'type_line', 'cmc', 'color_identity', 'set')
+    # Columns to select (in this order, followed by json_data) to build one
+    SELECT_COLUMNS = "name, type_line, cmc, color_identity, set_code, hot_exact, json_data"
+
+    def __init__(self, row):
+        name, type_line, cmc, identity, set_code, hot_exact, payload = row
+        if hot_exact:
+            self._hot = {'name': name, 'type_line': type_line, 'cmc': cmc,
+                         'color_identity': list(identity), 'set': set_code}
+        else:
+            self._hot = {'name': name}
+        self._payload = payload
+        self._data = None
+
+    def _full(self):
+        if self._data is None:
+            self._data = decode_payload(self._payload)
+            self._payload = None
+        return self._data
+
+    def __getitem__(self, key):
+        if self._data is None and key in self._hot:
+            return self._hot[key]
+        return self._full()[key]
+
+    def get(self, key, default=None):
+        if self._data is None and key in self._hot:
+            return self._hot[key]
+        return self._full().get(key, default)
+
+    def __contains__(self, key):
+        return self._full().__contains__(key)
+
+    def __setitem__(self, key, value):
+        self._full()[key] = value
+
+    def __delitem__(self, key):
+        del self._full()[key]
+
+    def __iter__(self):
+        return iter(self._full())
+
+    def __len__(self):
+        return len(self._full())
+
+    def copy(self):
+        return dict(self._full())
+
+    def __repr__(self):
+        if self._data is None:
+            return f"Card({self._hot['name']!r})"
+        return f"Card({self._data!r})"
+
+def _card_row(card, json_text=None):
+    # json_text lets importers store the source JSON verbatim instead of re-encoding
+    if json_text is None:
+        json_text = json.dumps(dict(card))
+    return (card.get('name'), compress_payload(json_text), payload_hash(json_text)) + card_columns(card)
+
+def name_trigrams(key):
+    """
+    Returns the set of trigrams of a normalized name. Each word is padded
+    so word starts and ends count: "sol ring" -> {"  s", " so", "sol", "ol ", ...}
+    """
+    grams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _name_similarity(key, name):
+    """Similarity (0..1) of a normalized name to a card name or any of its faces."""
+    keys = [normalize_name(name)]
+    if ' // ' in name:
+        keys.extend(normalize_name(face) for face in name.split(' // '))
+    return max(difflib.SequenceMatcher(None, key, k).ratio() for k in keys)
+
+class _TrigramIndex:
+    """Trigram postings over the normalized names of all cards."""
+    # A typo changes at most three trigrams, so counting only the rarest few
+    # still ranks the intended name near the top while skipping the huge
+    # postings of common trigrams like "  s" or "er "
+    PROBE_GRAMS = 8
+
+    def __init__(self, rows):
+        self.names = []
+        # Color identity mask of each name, to restrict lookups to a commander's pool
+        self.masks = []
+        self.postings = {}
+        for name, key, mask in rows:
+            i = len(self.names)
+            self.names.append(name)
+            self.masks.append(mask)
+            for gram in name_trigrams(key):
+                self.postings.setdefault(gram, []).append(i)
+
+    def candidates(self, key, limit, allowed_mask=ALL_COLORS_MASK):
+        """allowed_mask: only consider cards whose color identity fits within it."""
+        grams = sorted((gram for gram in name_trigrams(key) if gram in self.postings),
+                       key=lambda gram: len(self.postings[gram]))
+        counts = Counter()
+        outside = ALL_COLORS_MASK & ~allowed_mask
+        masks = self.masks
+        for gram in grams[:self.PROBE_GRAMS]:
+            if outside:
+                counts.update(i for i in self.postings[gram] if not masks[i] & outside)
+            else:
+                counts.update(self.postings[gram])
+        return [self.names[i] for i, _ in counts.most_common(limit)]
+
+# Bumped when the layout of the database changes; stored in the meta table
+SCHEMA_VERSION = 1
+
+class QueryCancelled(Exception):
+    """A query was stopped because its cancelled() check returned True."""
 
 class CardDatabase:
-    def __init__(self, db_path="cards.db"):
+    # Idle read connections kept around for reuse. Extra connections opened
+    # under heavy concurrency are closed when they are returned.
+    MAX_IDLE_READERS = 4
+
+    # Bulk imports write rows in batches of this size and report progress per batch
+    BULK_BATCH_SIZE = 1000
+    # Page cache used during bulk imports, in KiB (the SQLite default is ~2 MB)
+    BULK_CACHE_KB = 65536
+
+    # Names sharing the most trigrams with a misspelled name that get scored
+    FUZZY_CANDIDATES = 50
+    # A misspelled name is only accepted (get_card/get_cards with fuzzy) when
+    # the best match is at most FUZZY_MAX_EDITS letters off (scaled to the
+    # name's length, capped at FUZZY_MIN_SCORE) and beats the runner-up by
+    # FUZZY_MIN_GAP. Two wrong letters in a real name (Lightning Bolt vs
+    # Lightning Blast) already score ~0.9, so anything looser swaps cards.
+    FUZZY_MIN_SCORE = 0.93
+    FUZZY_MAX_EDITS = 1
+    FUZZY_MIN_GAP = 0.04
+    # SQLite virtual machine steps between checks whether a query was cancelled
+    CANCEL_CHECK_STEPS = 10000
+
+    def __init__(self, db_path="cards.db", build_indexes=True):
+        """
+        build_indexes: create secondary and full-text indexes right away.
+        Pass False when bulk loading a fresh database and call
+        build_indexes() once the data is in.
+        """
         self.db_path = db_path
+        self._build_indexes = build_indexes
+        self._read_pool = queue.LifoQueue()
+        # All writes go through a single connection, one transaction at a time
+        self._write_lock = threading.RLock()
+        self._write_conn = None
+        # False until the full-text index exists (it never will if this
+        # SQLite build lacks FTS5); searches then fall back to LIKE
+        self.has_fts = False
+        # Built on the first misspelled-name lookup, dropped when cards change
+        self._trigram_index = None
+        # Contents of the meta table, loaded on first use (see get_meta).
+        # Every committed write bumps the generation, so a read that a
+        # write overtook is never cached.
+        self._meta = None
+        self._meta_generation = 0
+        self._meta_lock = threading.Lock()
         self.init_db()
 
+    # --- Connection Management ---
+
+    def _connect(self):
+        # Connections are pooled and may be used by several threads over
+        # their lifetime (never concurrently), so disable the thread check.
+        # The timeout makes readers/writers wait on locks instead of failing.
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    @contextmanager
+    def _reader(self):
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if self._read_pool.qsize() < self.MAX_IDLE_READERS:
+                self._read_pool.put(conn)
+            else:
+                conn.close()
+
+    @contextmanager
+    def _cancellable(self, conn, cancelled):
+        """
+        Aborts queries on conn with QueryCancelled as soon as cancelled()
+        returns True, checked every CANCEL_CHECK_STEPS SQLite steps.
+        """
+        if cancelled is None:
+            yield
+            return
+        conn.set_progress_handler(lambda: 1 if cancelled() else 0, self.CANCEL_CHECK_STEPS)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if cancelled():
+                raise QueryCancelled() from e
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def _get_write_conn(self):
+        # Caller must hold _write_lock
+        if self._write_conn is None:
+            self._write_conn = self._connect()
+            # WAL is safe with NORMAL sync and keeps readers unblocked
+            self._write_conn.execute("PRAGMA synchronous = NORMAL")
+        return self._write_conn
+
+    @contextmanager
+    def _writer(self, bulk=False):
+        """
+        Runs a write transaction on the shared writer connection.
+        Commits on success, rolls back on error.
+        bulk: use bulk-load settings for the duration of the transaction.
+        """
+        with self._write_lock:
+            conn = self._get_write_conn()
+            if bulk:
+                self._begin_bulk_load(conn)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+                self._forget_meta()
+            finally:
+                if bulk:
+                    self._end_bulk_load(conn)
+
+    def _begin_bulk_load(self, conn):
+        conn.execute(f"PRAGMA cache_size = -{self.BULK_CACHE_KB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if not self._build_indexes:
+            # A database being filled from scratch (e.g. the updater's shadow
+            # copy) is thrown away if anything fails, so skip durability and
+            # write pages straight to the file instead of through the WAL
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA journal_mode = MEMORY")
+
+    def _end_bulk_load(self, conn):
+        conn.execute("PRAGMA cache_size = -2000")
+        conn.execute("PRAGMA temp_store = DEFAULT")
+        if not self._build_indexes:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+
+    def close(self):
+        with self._write_lock:
+            if self._write_conn is not None:
+                self._write_conn.close()
+                self._write_conn = None
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except queue.Empty:
+                break
+
     def init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS cards
-                     (name TEXT PRIMARY KEY, 
-                      json_data TEXT)''')
-        
-        # Check for type_line column and add if missing
-        c.execute("PRAGMA table_info(cards)")
-        columns = [info[1] for info in c.fetchall()]
-        if 'type_line' not in columns:
-            print("Migrating database: Adding type_line column...")
-            c.execute("ALTER TABLE cards ADD COLUMN type_line TEXT")
-            
-        conn.commit()
+        conn = self._connect()
+        # WAL lets searches, stub fetches and image downloads keep reading
+        # while an import is writing. The mode is persistent in the file.
+        conn.execute("PRAGMA journal_mode = WAL")
         conn.close()
 
+        with self._writer() as conn:
+            c = conn.cursor()
+            column_defs = "".join(f", {col} {col_type}" for col, col_type in CARD_COLUMNS)
+            c.execute(f'''CREATE TABLE IF NOT EXISTS cards
+                          (name TEXT PRIMARY KEY,
+                           json_data BLOB,
+                           payload_hash TEXT{column_defs})''')
+
+            # Small key/value facts about the data (see get_meta)
+            c.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+
+            c.execute("PRAGMA table_info(cards)")
+            columns = [info[1] for info in c.fetchall()]
+
+            # Rows without a hash are simply treated as changed by the next import
+            if 'payload_hash' not in columns:
+                print("Migrating database: Adding payload_hash column...")
+                c.execute("ALTER TABLE cards ADD COLUMN payload_hash TEXT")
+
+            # Add any filter columns missing from older databases
+            added = []
+            for col, col_type in CARD_COLUMNS:
+                if col not in columns:
+                    print(f"Migrating database: Adding {col} column...")
+                    c.execute(f"ALTER TABLE cards ADD COLUMN {col} {col_type}")
+                    added.append(col)
+
+            # Existing rows need the new columns filled in from their JSON
+            if added and c.execute("SELECT 1 FROM cards LIMIT 1").fetchone():
+                print("Migrating database: Extracting filter columns...")
+                self._backfill_columns(conn)
+
+            # Older databases stored plain JSON text; hashes stay valid since
+            # they are computed on the uncompressed text
+            compact = c.execute("SELECT 1 FROM cards WHERE typeof(json_data) = 'text' LIMIT 1").fetchone()
+            if compact:
+                print("Migrating database: Compressing card data...")
+                rows = c.execute("SELECT name, json_data FROM cards WHERE typeof(json_data) = 'text'").fetchall()
+                c.executemany("UPDATE cards SET json_data = ? WHERE name = ?",
+                              ((compress_payload(data), name) for name, data in rows))
+
+            if self._build_indexes:
+                self._create_indexes(conn)
+
+            # Databases from before the meta table get their count once here
+            meta = dict(c.execute("SELECT key, value FROM meta"))
+            if 'card_count' not in meta:
+                self._write_meta(conn, {
+                    'card_count': c.execute("SELECT Count(*) FROM cards").fetchone()[0],
+                    'data_version': meta.get('data_version', 0),
+                })
+            if meta.get('schema_version') != SCHEMA_VERSION:
+                self._write_meta(conn, {'schema_version': SCHEMA_VERSION})
+
+        if compact:
+            # Give the freed pages back to the file system
+            conn = self._connect()
+            conn.execute("VACUUM")
+            conn.close()
+            # VACUUM may renumber the rowids the full-text index refers to
+            if self.has_fts:
+                with self._writer() as conn:
+                    conn.execute("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')")
+
+    def _create_indexes(self, conn, rebuild_fts=False):
+        for index_name, col in CARD_INDEXES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON cards ({col})")
+        self._init_fts(conn)
+        if rebuild_fts and self.has_fts:
+            conn.execute("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')")
+
+    def _drop_indexes(self, conn):
+        # The full-text table itself stays; dropping its triggers stops per-row
+        # updates and _create_indexes(rebuild_fts=True) rebuilds it afterwards
+        for index_name, _ in CARD_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        for trigger in ("cards_fts_insert", "cards_fts_delete", "cards_fts_update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    def build_indexes(self):
+        """
+        Builds all indexes (including the full-text index) in one pass,
+        refreshes query planner statistics and checkpoints the WAL.
+        Used after bulk loading a database created with build_indexes=False.
+        """
+        with self._writer() as conn:
+            self._create_indexes(conn)
+            conn.execute("ANALYZE")
+        self._build_indexes = True
+        self.checkpoint()
+
+    def checkpoint(self):
+        with self._write_lock:
+            self._get_write_conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def apply_snapshot(self, source_path):
+        """
+        Makes the cards in this database match those in another database
+        file (e.g. a freshly built copy of the bulk data), writing only the
+        rows whose payload hash differs and deleting the rest. Everything
+        happens in one write transaction: readers keep seeing the old data
+        until it commits, and nothing changes if it fails.
+        Returns counts: {'inserted', 'updated', 'unchanged', 'deleted'}
+        """
+        columns = ", ".join(['name'] + _ROW_COLUMNS)
+        source_columns = ", ".join(f"s.{col}" for col in ['name'] + _ROW_COLUMNS)
+        updates = ", ".join(f"{col} = excluded.{col}" for col in _ROW_COLUMNS)
+        with self._write_lock:
+            conn = self._get_write_conn()
+            # ATTACH isn't allowed inside a transaction
+            conn.execute("ATTACH DATABASE ? AS snapshot", (source_path,))
+            try:
+                with self._writer(bulk=True) as conn:
+                    stored = conn.execute("SELECT Count(*) FROM cards").fetchone()[0]
+                    total = conn.execute("SELECT Count(*) FROM snapshot.cards").fetchone()[0]
+                    stats = {
+                        'inserted': conn.execute(
+                            "SELECT Count(*) FROM snapshot.cards s "
+                            "WHERE NOT EXISTS (SELECT 1 FROM main.cards m WHERE m.name = s.name)").fetchone()[0],
+                        'updated': conn.execute(
+                            "SELECT Count(*) FROM snapshot.cards s JOIN main.cards m ON m.name = s.name "
+                            "WHERE m.payload_hash IS NOT s.payload_hash").fetchone()[0],
+                        'deleted': conn.execute(
+                            "SELECT Count(*) FROM main.cards m "
+                            "WHERE NOT EXISTS (SELECT 1 FROM snapshot.cards s WHERE s.name = m.name)").fetchone()[0],
+                    }
+                    stats['unchanged'] = total - stats['inserted'] - stats['updated']
+
+                    # Filling an empty database: index once at the end, as bulk imports do
+                    rebuild_indexes = not stored and self._build_indexes
+                    if rebuild_indexes:
+                        self._drop_indexes(conn)
+                    if stats['deleted']:
+                        conn.execute("DELETE FROM main.cards WHERE name NOT IN (SELECT name FROM snapshot.cards)")
+                    if stats['inserted'] or stats['updated']:
+                        conn.execute(f"INSERT INTO main.cards ({columns}) SELECT {source_columns} "
+                                     "FROM snapshot.cards s LEFT JOIN main.cards m ON m.name = s.name "
+                                     f"WHERE m.payload_hash IS NOT s.payload_hash "
+                                     f"ON CONFLICT(name) DO UPDATE SET {updates}")
+                    if rebuild_indexes:
+                        self._create_indexes(conn, rebuild_fts=True)
+
+                    if stats['inserted'] or stats['updated'] or stats['deleted']:
+                        self._record_changes(conn, card_count=total)
+            finally:
+                conn.execute("DETACH DATABASE snapshot")
+        if stats['inserted'] or stats['deleted']:
+            self._trigram_index = None
+        return stats
+
+    def get_meta(self, key, default=None):
+        """
+        Returns a value from the meta table, which holds:
+        card_count: number of stored cards
+        data_version: bumped by every change to the cards
+        bulk_updated_at: updated_at of the Scryfall bulk file the cards came from
+        schema_version: SCHEMA_VERSION of the code that created the database
+        The table is read once and cached, so this is cheap enough for every search.
+        """
+        meta = self._meta
+        if meta is None:
+            generation = self._meta_generation
+            with self._reader() as conn:
+                meta = dict(conn.execute("SELECT key, value FROM meta"))
+            with self._meta_lock:
+                if generation == self._meta_generation:
+                    self._meta = meta
+        return meta.get(key, default)
+
+    def _forget_meta(self):
+        with self._meta_lock:
+            self._meta_generation += 1
+            self._meta = None
+
+    def set_meta(self, key, value):
+        with self._writer() as conn:
+            self._write_meta(conn, {key: value})
+
+    def _write_meta(self, conn, values):
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value = excluded.value", values.items())
+
+    def _record_changes(self, conn, added=0, card_count=None):
+        """
+        Bumps data_version and updates card_count inside a write transaction,
+        either to card_count or by the number of cards added.
+        """
+        meta = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('card_count', 'data_version')"))
+        self._write_meta(conn, {
+            'card_count': card_count if card_count is not None else meta.get('card_count', 0) + added,
+            'data_version': meta.get('data_version', 0) + 1,
+        })
+
+    def _init_fts(self, conn):
+        is_new = not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'cards_fts'").fetchone()
+        try:
+            for statement in FTS_SCHEMA:
+                conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable: {e}")
+            self.has_fts = False
+            return
+        self.has_fts = True
+
+        if is_new and conn.execute("SELECT 1 FROM cards LIMIT 1").fetchone():
+            print("Migrating database: Building full-text index...")
+            conn.execute("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')")
+
+    def _backfill_columns(self, conn):
+        assignments = ", ".join(f"{col} = ?" for col, _ in CARD_COLUMNS)
+        rows = conn.execute("SELECT name, json_data FROM cards").fetchall()
+        conn.executemany(f"UPDATE cards SET {assignments} WHERE name = ?",
+                         (card_columns(decode_payload(data)) + (name,) for name, data in rows))
+
     def save_card(self, card_data):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        # Extract type_line for filtering
-        type_line = card_data.get('type_line', '')
-        if not type_line and 'card_faces' in card_data:
-            type_line = card_data['card_faces'][0].get('type_line', '')
-
-        c.execute("INSERT OR REPLACE INTO cards (name, json_data, type_line) VALUES (?, ?, ?)", 
-                  (card_data.get('name'), json.dumps(card_data), type_line))
-        conn.commit()
-        conn.close()
-    
-    def get_card(self, name):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        # Try exact match first
-        c.execute("SELECT json_data FROM cards WHERE name = ?", (name,))
-        row = c.fetchone()
-        
-        # If not found, try case-insensitive match
-        if not row:
-            c.execute("SELECT json_data FROM cards WHERE name LIKE ? LIMIT 1", (name,))
+        self.save_cards([card_data])
+
+    def save_cards(self, cards):
+        """Saves (inserts or replaces) a list of card dicts in one transaction."""
+        rows = {}
+        for card in cards:
+            row = _card_row(card)
+            rows[row[0]] = row
+        if not rows:
+            return
+        with self._writer() as conn:
+            added = sum(1 for name in rows
+                        if not conn.execute("SELECT 1 FROM cards WHERE name = ?", (name,)).fetchone())
+            conn.executemany(_INSERT_SQL, rows.values())
+            self._record_changes(conn, added=added)
+        self._trigram_index = None
+
+    def get_card(self, name, fuzzy=False):
+        """
+        Finds a card by exact name, then by normalized name or front face.
+        fuzzy: as a last resort accept a clear misspelling of a stored name
+        (see fuzzy_match). Only for names Scryfall couldn't resolve or when
+        offline: a card newer than the local data would otherwise be
+        swapped for a similar one.
+        """
+        with self._reader() as conn:
+            c = conn.cursor()
+            # Try exact match first
+            c.execute(f"SELECT {Card.SELECT_COLUMNS} FROM cards WHERE name = ?", (name,))
             row = c.fetchone()
-            
-        conn.close()
+
+            # If not found, match on the normalized full name, then the front face
+            key = normalize_name(name)
+            if not row and key:
+                c.execute(f"""SELECT {Card.SELECT_COLUMNS} FROM cards
+                             WHERE name_key = ? OR face_key = ?
+                             ORDER BY name_key = ? DESC LIMIT 1""", (key, key, key))
+                row = c.fetchone()
+
         if row:
-            return json.loads(row[0])
+            return Card(row)
+        if fuzzy:
+            match = self.fuzzy_match(name)
+            if match:
+                return self.get_card(match)
         return None
 
-    def search_cards(self, query, limit=100, filter_func=None):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+    def find_similar_names(self, name, limit=5, allowed_mask=ALL_COLORS_MASK):
+        """
+        Ranks card names by similarity to a possibly misspelled name,
+        comparing against whole names and split/double-faced card faces.
+        allowed_mask: only rank cards whose color identity fits within this
+        color mask (see color_mask).
+        Returns [(score, card name)] best first; score 1.0 is an exact
+        normalized match.
+        """
+        key = normalize_name(name)
+        if not key:
+            return []
+
+        index = self._trigram_index
+        if index is None:
+            with self._reader() as conn:
+                index = _TrigramIndex(conn.execute("SELECT name, name_key, color_mask FROM cards"))
+            self._trigram_index = index
+
+        scored = [(_name_similarity(key, candidate), candidate)
+                  for candidate in index.candidates(key, self.FUZZY_CANDIDATES, allowed_mask)]
+        scored.sort(key=lambda match: (-match[0], match[1]))
+        return scored[:limit]
+
+    def fuzzy_match(self, name, allowed_mask=ALL_COLORS_MASK):
+        """
+        The stored card name a misspelled name clearly refers to, or None
+        if no candidate is close enough or two are about as close (then
+        show find_similar_names to the user instead).
+        """
+        matches = self.find_similar_names(name, limit=2, allowed_mask=allowed_mask)
+        # One changed letter in a name of n letters scores (n - 1) / n
+        key_length = max(len(normalize_name(name)), 1)
+        min_score = min(self.FUZZY_MIN_SCORE, 1 - self.FUZZY_MAX_EDITS / key_length)
+        if not matches or matches[0][0] < min_score:
+            return None
+        if len(matches) > 1 and matches[0][0] - matches[1][0] < self.FUZZY_MIN_GAP:
+            return None
+        return matches[0][1]
+
+    def get_cards(self, names, fuzzy=False, identity=None):
+        """
+        Resolves a list of card names in one pass.
+        Uses the same matching as get_card (exact, normalized, front face,
+        then a clear misspelling if fuzzy).
+        identity: color identity letters (e.g. a commander's); only cards
+        legal under it are returned, and misspellings are only matched
+        against that pool.
+        Returns a dict of requested name -> card for every name that was found.
+        """
+        wanted = {}
+        for name in names:
+            wanted.setdefault(name, normalize_name(name))
+
+        allowed_mask = color_mask(identity) if identity is not None else ALL_COLORS_MASK
+
+        by_name = {}
+        by_key = {}
+        by_face = {}
+        unique_names = list(wanted)
+        # Stay well below SQLite's bound parameter limit
+        chunk_size = 300
+        with self._reader() as conn:
+            for start in range(0, len(unique_names), chunk_size):
+                chunk = unique_names[start:start + chunk_size]
+                keys = list({wanted[n] for n in chunk if wanted[n]})
+                sql = """SELECT name_key, face_key, {} FROM cards
+                         WHERE name IN ({}) OR name_key IN ({}) OR face_key IN ({})""".format(
+                    Card.SELECT_COLUMNS,
+                    ", ".join("?" * len(chunk)), ", ".join("?" * len(keys)), ", ".join("?" * len(keys)))
+                for row in conn.execute(sql, chunk + keys + keys):
+                    name_key, face_key, card = row[0], row[1], Card(row[2:])
+                    by_name[card['name']] = card
+                    by_key.setdefault(name_key, card)
+                    by_face.setdefault(face_key, card)
+
+        results = {}
+        for name, key in wanted.items():
+            card = by_name.get(name)
+            if not card and key:
+                card = by_key.get(key) or by_face.get(key)
+            if card:
+                results[name] = card
+
+        # Names of cards outside the pool are dropped, not guessed at
+        known = set(results)
+        if allowed_mask != ALL_COLORS_MASK:
+            results = {name: card for name, card in results.items()
+                       if not color_mask(card['color_identity']) & ~allowed_mask}
+
+        if fuzzy:
+            best = {}
+            for name in wanted:
+                if name not in known:
+                    match = self.fuzzy_match(name, allowed_mask)
+                    if match:
+                        best[name] = match
+            if best:
+                found = {card['name']: card for card in self.filter_names(set(best.values()), limit=len(best))}
+                for name, match in best.items():
+                    if match in found:
+                        results[name] = found[match]
+        return results
+
+    def get_name_keys(self):
+        """Returns (name_key, name, color_mask) for every card except tokens."""
+        with self._reader() as conn:
+            return conn.execute("""SELECT name_key, name, color_mask FROM cards
+                                   WHERE name_key != ''
+                                   AND (type_line IS NULL OR type_line NOT LIKE '%Token%')""").fetchall()
+
+    def filter_names(self, names, where=None, params=(), limit=100, cancelled=None):
+        """
+        Returns up to limit cards with the given exact names that match the
+        optional SQL condition (see search_cards), in the order of names.
+        names can be any iterable; it is only consumed as far as needed.
+        cancelled: see search_cards.
+        """
+        names = iter(names)
+        # Names per query, staying well below SQLite's bound parameter limit
+        batch_size = 400
+        matched = []
+        with self._reader() as conn, self._cancellable(conn, cancelled):
+            # Test the condition on names only, then load just the cards returned
+            while len(matched) < limit:
+                if cancelled and cancelled():
+                    raise QueryCancelled()
+                batch = list(itertools.islice(names, batch_size))
+                if not batch:
+                    break
+                sql = "SELECT name FROM cards WHERE name IN ({}) {}".format(
+                    ", ".join("?" * len(batch)), f"AND ({where})" if where else "")
+                found = {row[0] for row in conn.execute(sql, (*batch, *params))}
+                matched.extend(name for name in batch if name in found)
+            matched = matched[:limit]
+            if not matched:
+                return []
+
+            sql = "SELECT {} FROM cards WHERE name IN ({})".format(
+                Card.SELECT_COLUMNS, ", ".join("?" * len(matched)))
+            cards = {row[0]: Card(row) for row in conn.execute(sql, matched)}
+        return [cards[name] for name in matched if name in cards]
+
+    def query_cards_page(self, where, params=(), limit=100, filter_func=None, cancelled=None, after=None):
+        """
+        One page of cards (tokens excluded) matching a SQL condition on the
+        filter columns, ordered by name. filter_func, cancelled: as in
+        search_cards. Returns (cards, next_after): pass next_after back as
+        after to get the following page; it is None after the last one.
+        """
+        sql = """SELECT {} FROM cards
+                 WHERE ({})
+                 AND (type_line IS NULL OR type_line NOT LIKE '%Token%')
+                 {}
+                 ORDER BY name""".format(Card.SELECT_COLUMNS, where, "AND name > ?" if after else "")
+        if after:
+            params = [*params, after]
+
+        results = []
+        next_after = None
+        with self._reader() as conn, self._cancellable(conn, cancelled):
+            c = conn.cursor()
+            c.execute(sql, params)
+            for row in c:
+                card = Card(row)
+                if filter_func and not filter_func(card):
+                    continue
+                results.append(card)
+                if len(results) >= limit:
+                    # Continue right after the last card (rows are ordered by the unique name)
+                    next_after = card['name']
+                    break
+            c.close()
+        return results, next_after
+
+    def search_cards(self, query, limit=100, filter_func=None, where=None, params=(), cancelled=None):
+        """
+        Searches cards by name.
+        where/params: optional SQL condition on the filter columns (see services/card_filters.py)
+        filter_func: optional Python predicate for anything that can't be expressed in SQL
+        cancelled: optional function checked while the query runs; once it
+        returns True the search stops with QueryCancelled
+        """
+        return self.search_cards_page(query, limit, filter_func, where, params, cancelled)[0]
+
+    def search_cards_page(self, query, limit=100, filter_func=None, where=None, params=(), cancelled=None,
+                          after=None):
+        """
+        One page of search_cards. Returns (cards, next_after): pass next_after
+        back as after to get the following page; it is None after the last one.
+        """
+        # Word/prefix match through the full-text index when available.
+        # Later pages stay with whichever match the first page used.
+        name_match = fts_query(query, 'name') if self.has_fts else None
+        if name_match and (after is None or after[0] == 'fts'):
+            results, next_after = self._search_by_name(
+                'fts', "rowid IN (SELECT rowid FROM cards_fts WHERE cards_fts MATCH ?)", name_match,
+                query, limit, filter_func, where, params, cancelled, after)
+            if results or after is not None:
+                return results, next_after
+
+        # Substring match (also catches partial words the index can't)
         # Replace spaces with % for fuzzy-ish search
         formatted_query = query.replace(' ', '%')
-        
+        return self._search_by_name('like', "name LIKE ?", f"%{formatted_query}%",
+                                    query, limit, filter_func, where, params, cancelled, after)
+
+    def _search_by_name(self, match_kind, name_condition, name_param, query, limit, filter_func, where, params,
+                        cancelled=None, after=None):
+        formatted_query = query.replace(' ', '%')
+
         # Filter tokens in SQL directly using type_line column
         # Prioritize:
         # 1. Exact match (case-insensitive via LIKE without wildcards)
         # 2. Starts with
         # 3. Contains
+        # Pages continue after the (rank, name) of the last card returned
         sql = """
-            SELECT json_data FROM cards 
-            WHERE name LIKE ? 
-            AND (type_line IS NULL OR type_line NOT LIKE '%Token%')
-            ORDER BY 
-                CASE 
-                    WHEN name LIKE ? THEN 0 
-                    WHEN name LIKE ? THEN 1 
-                    ELSE 2 
-                END,
-                name
-        """
-        
-        # Params: 
-        # 1. WHERE name LIKE %query%
-        # 2. Exact match: query
-        # 3. Starts with: query%
-        
-        c.execute(sql, (f"%{formatted_query}%", query, f"{formatted_query}%"))
-        
+            SELECT * FROM (
+                SELECT
+                    CASE
+                        WHEN name LIKE ? THEN 0
+                        WHEN name LIKE ? THEN 1
+                        ELSE 2
+                    END AS name_rank,
+                    {}
+                FROM cards
+                WHERE {}
+                AND (type_line IS NULL OR type_line NOT LIKE '%Token%')
+                {}
+            )
+            {}
+            ORDER BY name_rank, name
+        """.format(Card.SELECT_COLUMNS, name_condition, f"AND ({where})" if where else "",
+                   "WHERE (name_rank, name) > (?, ?)" if after else "")
+
+        # Params:
+        # 1. Exact match: query
+        # 2. Starts with: query%
+        # 3. Name condition (FTS match or LIKE %query%)
+        #    (followed by any params for the extra filter condition)
+        # 4. The position to continue after, for later pages
+        sql_params = [query, f"{formatted_query}%", name_param, *params]
+        if after:
+            sql_params.extend(after[1:])
+
         results = []
-        # Iterate cursor directly to avoid loading all results
-        for row in c:
-            try:
-                card = json.loads(row[0])
-                
-                # Apply Python-side filtering if provided
-                if filter_func and not filter_func(card):
+        next_after = None
+        with self._reader() as conn, self._cancellable(conn, cancelled):
+            c = conn.cursor()
+            c.execute(sql, sql_params)
+
+            # Iterate cursor directly to avoid loading all results
+            for row in c:
+                try:
+                    card = Card(row[1:])
+
+                    # Apply Python-side filtering if provided
+                    if filter_func and not filter_func(card):
+                        continue
+
+                    results.append(card)
+                    if len(results) >= limit:
+                        next_after = (match_kind, row[0], card['name'])
+                        break
+                except Exception as e:
+                    print(f"Error parsing card in search: {e}")
                     continue
-                    
-                results.append(card)
-                if len(results) >= limit:
-                    break
-            except Exception as e:
-                print(f"Error parsing card in search: {e}")
-                continue
-                
-        conn.close()
-        return results
-    
-    def bulk_import(self, cards_list, progress_callback=None):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("BEGIN TRANSACTION")
-        total = len(cards_list)
-        for i, card in enumerate(cards_list):
-            type_line = card.get('type_line', '')
-            if not type_line and 'card_faces' in card:
-                type_line = card['card_faces'][0].get('type_line', '')
-
-            c.execute("INSERT OR REPLACE INTO cards (name, json_data, type_line) VALUES (?, ?, ?)", 
-                      (card.get('name'), json.dumps(card), type_line))
-            if progress_callback and i % 250 == 0:
-                progress_callback(i, total, card.get('name'))
-        conn.commit()
-        conn.close()
+            c.close()
+
+        return results, next_after
+
+    def bulk_import(self, cards, progress_callback=None, rebuild_indexes=None):
+        """
+        Imports cards in a single transaction, writing only new or changed cards.
+        cards: a list or any iterable of card dicts (e.g. a streaming parser);
+        progress_callback(current, total, name) is called once per batch and
+        gets total=None for iterables without a length.
+        rebuild_indexes: drop secondary/full-text indexes during the load and
+        rebuild them once at the end. Defaults to doing so when the table is empty.
+        Returns counts: {'inserted', 'updated', 'unchanged'}
+        """
+        total = len(cards) if hasattr(cards, '__len__') else None
+        return self._import_entries(((card, None) for card in cards), total, progress_callback, rebuild_indexes)
+
+    def bulk_import_raw(self, entries, progress_callback=None, rebuild_indexes=None):
+        """
+        Like bulk_import, but takes (card, json_text) pairs and stores each
+        card's source JSON text as-is. The card dict is only used for the
+        filter columns, so nothing is re-encoded.
+        """
+        total = len(entries) if hasattr(entries, '__len__') else None
+        return self._import_entries(entries, total, progress_callback, rebuild_indexes)
+
+    def _import_entries(self, entries, total, progress_callback, rebuild_indexes):
+        stats = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        with self._writer(bulk=True) as conn:
+            # Compare payload hashes against what is stored and only write differences
+            stored = dict(conn.execute("SELECT name, payload_hash FROM cards"))
+
+            if rebuild_indexes is None:
+                rebuild_indexes = not stored
+            # Databases created with build_indexes=False have none to drop
+            rebuild_indexes = rebuild_indexes and self._build_indexes
+            if rebuild_indexes:
+                self._drop_indexes(conn)
+
+            seen = set()
+            batch = []
+            processed = 0
+            name = None
+            for card, json_text in entries:
+                processed += 1
+                name = card.get('name')
+                # Names can repeat (e.g. tokens); the first one wins so
+                # repeated imports stay stable
+                if name in seen:
+                    continue
+                seen.add(name)
+
+                if json_text is None:
+                    json_text = json.dumps(card)
+                card_hash = payload_hash(json_text)
+                if name not in stored:
+                    stats['inserted'] += 1
+                elif stored[name] == card_hash:
+                    stats['unchanged'] += 1
+                    continue
+                else:
+                    stats['updated'] += 1
+                batch.append((name, compress_payload(json_text), card_hash) + card_columns(card))
+
+                if len(batch) >= self.BULK_BATCH_SIZE:
+                    conn.executemany(_INSERT_SQL, batch)
+                    batch = []
+                    if progress_callback:
+                        progress_callback(processed, total, name)
+
+            if batch:
+                conn.executemany(_INSERT_SQL, batch)
+            if progress_callback and name is not None:
+                progress_callback(processed, total, name)
+
+            if rebuild_indexes:
+                self._create_indexes(conn, rebuild_fts=True)
+
+            if stats['inserted'] or stats['updated']:
+                self._record_changes(conn, card_count=len(stored) + stats['inserted'])
+        if stats['inserted']:
+            self._trigram_index = None
+        return stats
 
     def count(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT Count(*) FROM cards")
-        count = c.fetchone()[0]
-        conn.close()
-        return count
+        return self.get_meta('card_count', 0)
 
     def get_all_cards_generator(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT json_data FROM cards")
-        while True:
-            rows = c.fetchmany(1000)
-            if not rows:
-                break
-            for row in rows:
-                yield json.loads(row[0])
-        conn.close()
+        # Holds one pooled read connection until the generator is exhausted or closed
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.execute(f"SELECT {Card.SELECT_COLUMNS} FROM cards")
+            try:
+                while True:
+                    rows = c.fetchmany(1000)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield Card(row)
+            finally:
+                c.close()
@@ -0,0 +1,204 @@
+from collections import namedtuple
+
+from database import fts_query, color_mask, ALL_COLORS_MASK
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def parse_cmc_filter(filter_str):
+    """
+    Parses a CMC filter like ">=3", "<2" or "4".
+    Returns (operator, value) or None if the filter is invalid.
+    """
+    filter_str = filter_str.strip()
+    for op in (">=", "<=", ">", "<", "="):
+        if filter_str.startswith(op):
+            filter_str = filter_str[len(op):]
+            break
+    else:
+        op = "="
+    try:
+        return op, float(filter_str)
+    except ValueError:
+        return None
+
+def allowed_colors(filters):
+    """
+    Combines the commander identity and color filters into the set of allowed
+    color identity letters, or None if neither filter is set.
+    """
+    allowed = None
+    if 'commander_identity' in filters:
+        allowed = set(filters['commander_identity'])
+    if 'colors' in filters:
+        selected = set(filters['colors'])
+        allowed = allowed & selected if allowed is not None else selected
+    return allowed
+
+_CMC_CHECKS = {
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+    "=": lambda a, b: a == b,
+}
+
+class CardFilter(namedtuple('CardFilter', [
+        'allowed_mask', 'type_terms', 'cmc', 'text', 'text_words',
+        'paper_only', 'no_silver', 'no_playtest', 'no_oversized', 'no_funny',
+        'excluded_sets', 'known_ub_sets', 'no_ub_other'])):
+    """
+    The search panel filters dict, compiled once per search into an
+    immutable predicate. matches() checks a card dict in Python, to_sql()
+    gives the same conditions on the cards filter columns.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def compile(cls, filters, ub_sets_config):
+        allowed = allowed_colors(filters)
+
+        # Type and subtypes match the card type line or any face type line
+        type_terms = []
+        if 'type' in filters:
+            type_terms.append(filters['type'])
+        if 'subtype' in filters:
+            type_terms.extend(s.strip() for s in filters['subtype'].split(',') if s.strip())
+
+        text = filters.get('text') or None
+        prefs = filters.get('prefs', {})
+
+        known_ub_sets = []
+        excluded_sets = []
+        for _, key, codes in ub_sets_config:
+            known_ub_sets.extend(codes)
+            if not prefs.get(key, True):
+                excluded_sets.extend(codes)
+
+        return cls(
+            allowed_mask=color_mask(allowed) if allowed is not None else None,
+            type_terms=tuple(t.lower() for t in type_terms),
+            cmc=parse_cmc_filter(filters['cmc']) if 'cmc' in filters else None,
+            text=text,
+            text_words=tuple(text.lower().split()) if text else (),
+            paper_only=not prefs.get('include_alchemy', False),
+            no_silver=not prefs.get('include_silver', False),
+            no_playtest=not prefs.get('include_playtest', False),
+            no_oversized=not prefs.get('include_oversized', False),
+            no_funny=not prefs.get('include_funny', False),
+            excluded_sets=frozenset(excluded_sets),
+            known_ub_sets=frozenset(known_ub_sets),
+            no_ub_other=not prefs.get('ub_other', True),
+        )
+
+    def matches(self, card):
+        # Color identity must be a subset of the allowed colors
+        if self.allowed_mask is not None:
+            if color_mask(card.get('color_identity', [])) & ~self.allowed_mask:
+                return False
+
+        faces = card.get('card_faces')
+
+        if self.type_terms:
+            type_lines = card.get('type_line', '').lower()
+            if faces:
+                type_lines += '\n' + '\n'.join(face.get('type_line', '').lower() for face in faces)
+            for term in self.type_terms:
+                if term not in type_lines:
+                    return False
+
+        if self.cmc is not None:
+            op, val = self.cmc
+            if not _CMC_CHECKS[op](card.get('cmc', 0), val):
+                return False
+
+        if self.text_words and not self.matches_text(card):
+            return False
+
+        if self.paper_only and 'paper' not in card.get('games', []):
+            return False
+        if self.no_silver and card.get('border_color') == 'silver':
+            return False
+        if self.no_playtest and (card.get('set_type') == 'memorabilia'
+                                 or 'playtest' in card.get('promo_types', [])):
+            return False
+        if self.no_oversized and card.get('oversized', False):
+            return False
+        if self.no_funny and card.get('set_type') == 'funny':
+            return False
+
+        # Universes Beyond
+        if self.excluded_sets or self.no_ub_other:
+            card_set = card.get('set', '').lower()
+            if card_set in self.excluded_sets:
+                return False
+            # "Other" covers triangle-stamped cards outside the configured sets
+            if (self.no_ub_other and card.get('security_stamp') == 'triangle'
+                    and card_set not in self.known_ub_sets):
+                return False
+
+        return True
+
+    def matches_text(self, card):
+        """Every text filter word must appear in the oracle text (of any face)."""
+        if 'card_faces' in card:
+            oracle_text = " ".join(face.get('oracle_text', '').lower() for face in card['card_faces'])
+        else:
+            oracle_text = card.get('oracle_text', '').lower()
+        return all(word in oracle_text for word in self.text_words)
+
+    def to_sql(self, use_fts=True):
+        """
+        Returns (sql, params); sql is "" when nothing filters.
+        The text filter is only included when use_fts is set (it needs the
+        full-text index); otherwise check it with matches_text.
+        """
+        clauses = []
+        params = []
+
+        if self.allowed_mask is not None:
+            clauses.append("color_mask & ? = 0")
+            params.append(ALL_COLORS_MASK & ~self.allowed_mask)
+
+        for term in self.type_terms:
+            clauses.append("type_lines LIKE ? ESCAPE '\\'")
+            params.append(f"%{escape_like(term)}%")
+
+        if self.cmc is not None:
+            op, val = self.cmc
+            clauses.append(f"cmc {op} ?")
+            params.append(val)
+
+        # Every word (prefix) or "quoted phrase" must appear in the oracle text
+        if use_fts and self.text:
+            text_match = fts_query(self.text, 'oracle_text')
+            if text_match:
+                clauses.append("rowid IN (SELECT rowid FROM cards_fts WHERE cards_fts MATCH ?)")
+                params.append(text_match)
+
+        if self.paper_only:
+            clauses.append("games LIKE '%,paper,%'")
+        if self.no_silver:
+            clauses.append("border_color != 'silver'")
+        if self.no_playtest:
+            clauses.append("set_type != 'memorabilia' AND promo_types NOT LIKE '%,playtest,%'")
+        if self.no_oversized:
+            clauses.append("oversized = 0")
+        if self.no_funny:
+            clauses.append("set_type != 'funny'")
+
+        if self.excluded_sets:
+            excluded = sorted(self.excluded_sets)
+            clauses.append(f"set_code NOT IN ({', '.join('?' * len(excluded))})")
+            params.extend(excluded)
+
+        if self.no_ub_other:
+            if self.known_ub_sets:
+                known = sorted(self.known_ub_sets)
+                clauses.append(f"NOT (security_stamp = 'triangle' AND set_code NOT IN ({', '.join('?' * len(known))}))")
+                params.extend(known)
+            else:
+                clauses.append("security_stamp != 'triangle'")
+
+        sql = " AND ".join(f"({c})" for c in clauses)
+        return sql, params
@@ -1,11 +1,156 @@
 import requests
 import json
+from database import CardDatabase
+import codecs
+import os
 import threading
 
+def iter_json_array(stream, chunk_size=1 << 20, with_raw=False):
+    """
+    Incrementally parses a top-level JSON array from a binary stream,
+    yielding one element at a time. Only the unparsed tail of the input is
+    kept in memory.
+    with_raw: yield (element, source_text) pairs, where source_text is the
+    element's exact span in the input.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        # Skip whitespace and separators between elements
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError("Bulk data is not a JSON array")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The element continues in the next chunk
+                if eof:
+                    raise
+            else:
+                if with_raw:
+                    yield item, buf[pos:end]
+                else:
+                    yield item
+                pos = end
+                continue
+        elif eof:
+            raise ValueError("Bulk data ended before the closing ']'")
+
+        # Need more input
+        data = stream.read(chunk_size)
+        buf = buf[pos:]
+        pos = 0
+        if data:
+            buf += utf8.decode(data)
+        else:
+            eof = True
+            buf += utf8.decode(b"", final=True)
+
+class _DownloadSpool:
+    """
+    File the download thread appends to while the importer reads it, so
+    parsing and importing overlap with the download. With resume=True the
+    existing file content is kept and new data is appended after it.
+    """
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._write_file = open(path, "ab" if resume else "wb")
+        self._read_file = open(path, "rb")
+        self._cond = threading.Condition()
+        self.written = self._write_file.tell()
+        self.read_pos = 0
+        self.done = False
+        self.cancelled = False
+        self.error = None
+
+    def write(self, data):
+        self._write_file.write(data)
+        self._write_file.flush()
+        with self._cond:
+            self.written += len(data)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def wait_done(self):
+        with self._cond:
+            while not self.done:
+                self._cond.wait()
+            if self.error:
+                raise self.error
+
+    def read(self, size):
+        """Blocks until data is available; returns b"" at the end of the download."""
+        with self._cond:
+            while self.read_pos >= self.written and not self.done:
+                self._cond.wait()
+            if self.error:
+                raise self.error
+            available = self.written - self.read_pos
+        data = self._read_file.read(min(size, available))
+        self.read_pos += len(data)
+        return data
+
+    def close(self, remove=False):
+        self.cancelled = True
+        self._write_file.close()
+        self._read_file.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                print(f"Could not remove download file {self.path}: {e}")
+
 class DataUpdater:
-    def __init__(self, db, session=None):
+    BULK_DATA_URL = "https://api.scryfall.com/bulk-data"
+    # (connect, read) seconds; the read timeout is per chunk, so a stalled
+    # download fails instead of blocking the updater forever
+    TIMEOUT = (10, 60)
+
+    def __init__(self, db, session=None, bulk_data_url=BULK_DATA_URL,
+                 state_file="bulk_data.json", download_path="cards.json.part"):
         self.db = db
         self.session = session if session else requests.Session()
+        self.bulk_data_url = bulk_data_url
+        # Version info of the last imported bulk file (and of an unfinished download)
+        self.state_file = state_file
+        # Kept across runs so an interrupted download can be resumed
+        self.download_path = download_path
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """
+        Registers callback() to be called after an update changed the
+        database. It runs on the update thread.
+        """
+        self._listeners.append(callback)
+
+    def _notify_listeners(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in database update listener: {e}")
 
     def update_database(self, progress_callback, completion_callback):
         """
@@ -15,45 +160,225 @@ class DataUpdater:
         """
         threading.Thread(target=self._run_update_db, args=(progress_callback, completion_callback), daemon=True).start()
 
+    def load_state(self):
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Error loading bulk data state: {e}")
+        return {}
+
+    def save_state(self, state):
+        try:
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=4)
+        except Exception as e:
+            print(f"Error saving bulk data state: {e}")
+
+    def _download_to_spool(self, response, spool):
+        try:
+            for data in response.iter_content(chunk_size=65536):
+                if spool.cancelled:
+                    break
+                spool.write(data)
+            spool.finish()
+        except Exception as e:
+            spool.finish(e)
+        finally:
+            response.close()
+
+    def _open_download(self, item, state):
+        """
+        Requests the bulk file, resuming a partial download or revalidating
+        the last import when possible.
+        Returns (response, resume) or (None, False) if the file is unchanged.
+        """
+        download_uri = item['download_uri']
+        # Byte offsets must match the file on disk, so never accept a compressed transfer
+        headers = {'Accept-Encoding': 'identity'}
+
+        partial = state.get('partial', {})
+        resume_from = 0
+        if partial.get('download_uri') == download_uri and os.path.exists(self.download_path):
+            resume_from = os.path.getsize(self.download_path)
+
+        if resume_from:
+            headers['Range'] = f"bytes={resume_from}-"
+            # Only resume if the file on the server is still the one we started
+            validator = partial.get('etag') or partial.get('last_modified')
+            if validator:
+                headers['If-Range'] = validator
+        elif state.get('download_uri') == download_uri and self.db.count() > 0:
+            if state.get('etag'):
+                headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'):
+                headers['If-Modified-Since'] = state['last_modified']
+
+        r = self.session.get(download_uri, stream=True, headers=headers, timeout=self.TIMEOUT)
+        if r.status_code == 304:
+            r.close()
+            return None, False
+        if r.status_code == 416 and resume_from:
+            # Nothing left to send after our offset: the partial file isn't
+            # a prefix of the current file, so start over
+            r.close()
+            print("Cannot resume download, starting over")
+            os.remove(self.download_path)
+            return self._open_download(item, state)
+        if r.status_code == 206:
+            content_range = r.headers.get('Content-Range', '')
+            if not content_range.startswith(f"bytes {resume_from}-"):
+                r.close()
+                raise ValueError(f"Unexpected Content-Range: {content_range}")
+            return r, True
+        r.raise_for_status()
+        return r, False
+
+    def _downloaded_file(self, item, state):
+        """
+        True if an earlier run already downloaded the whole bulk file but
+        stopped before its import finished. A partial file longer than the
+        bulk file can't be resumed and is removed.
+        """
+        partial = state.get('partial', {})
+        size = item.get('size')
+        if not size or partial.get('download_uri') != item['download_uri'] or not os.path.exists(self.download_path):
+            return False
+        downloaded = os.path.getsize(self.download_path)
+        if downloaded > size:
+            os.remove(self.download_path)
+            return False
+        return downloaded == size
+
+    def _shadow_path(self):
+        return self.db.db_path + ".new"
+
+    def _remove_shadow(self):
+        # Includes the WAL/shared-memory files SQLite keeps next to the database
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            path = self._shadow_path() + suffix
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _verified(self, entries, spool, expected_size):
+        """Passes entries through, then fails (rolling back the import) if the download is short or corrupt."""
+        yield from entries
+        spool.wait_done()
+        if expected_size and spool.written != expected_size:
+            raise ValueError(f"Downloaded {spool.written} bytes, expected {expected_size}")
+
     def _run_update_db(self, progress_callback, completion_callback):
+        spool = None
+        download_thread = None
+        keep_partial = False
+        shadow = None
         try:
             progress_callback(0, 0, 0, "Fetching bulk data info...")
-            r = self.session.get("https://api.scryfall.com/bulk-data")
+            r = self.session.get(self.bulk_data_url, timeout=self.TIMEOUT)
             data = r.json()
             oracle_cards = next(item for item in data['data'] if item['type'] == 'oracle_cards')
             download_uri = oracle_cards['download_uri']
-            
+
+            state = self.load_state()
+            if state.get('updated_at') == oracle_cards.get('updated_at') and self.db.count() > 0:
+                completion_callback(True, "Database is already up to date.")
+                return
+
             progress_callback(0, 0, 0, "Downloading card data...")
-            
-            r = self.session.get(download_uri, stream=True)
-            total_length = int(r.headers.get('content-length', 0))
-            
-            content = b""
-            if total_length == 0:
-                content = r.content
-                progress_callback(50, 0, 0, "Downloading...")
+
+            if self._downloaded_file(oracle_cards, state):
+                # Only the import is left to do
+                r = None
+                resume = True
+            else:
+                r, resume = self._open_download(oracle_cards, state)
+                if r is None:
+                    state['updated_at'] = oracle_cards.get('updated_at')
+                    self.save_state(state)
+                    self.db.set_meta('bulk_updated_at', oracle_cards.get('updated_at'))
+                    completion_callback(True, "Database is already up to date.")
+                    return
+
+                # Remember what is being downloaded so a crash can resume it
+                state['partial'] = {
+                    'download_uri': download_uri,
+                    'etag': r.headers.get('ETag'),
+                    'last_modified': r.headers.get('Last-Modified'),
+                }
+                self.save_state(state)
+            validators = state['partial']
+
+            # Download in the background while cards are parsed and imported
+            # from the spooled file as the bytes arrive
+            spool = _DownloadSpool(self.download_path, resume=resume)
+            keep_partial = True
+            if r is None:
+                print(f"Importing the {spool.written} bytes downloaded earlier")
+                spool.finish()
             else:
-                dl = 0
-                for data in r.iter_content(chunk_size=8192):
-                    dl += len(data)
-                    content += data
-                    percent = int(50 * dl / total_length)
-                    progress_callback(percent, 0, 0, "Downloading...")
-            
-            progress_callback(50, 0, 0, "Parsing JSON...")
-            cards = json.loads(content)
-            
-            progress_callback(50, 0, len(cards), f"Importing {len(cards)} cards...")
-            
+                if resume:
+                    print(f"Resuming download at {spool.written} bytes")
+                download_thread = threading.Thread(target=self._download_to_spool, args=(r, spool), daemon=True)
+                download_thread.start()
+
+            expected_size = oracle_cards.get('size') or 0
+            if not expected_size and r is not None and r.headers.get('content-length'):
+                expected_size = spool.written + int(r.headers['content-length'])
+
             def db_progress(current, total, name):
-                # Calculate percentage for the second 50% (import phase)
-                percent = 50 + ((current / total) * 50)
-                progress_callback(percent, current, total, f"Importing: {name}")
-
-            self.db.bulk_import(cards, db_progress)
-            
-            completion_callback(True, "Database updated successfully.")
-            
+                # Progress follows how far into the file the importer has read
+                percent = int(100 * spool.read_pos / expected_size) if expected_size else 0
+                progress_callback(percent, current, expected_size, f"Importing: {name} ({current} cards)")
+
+            # Build a fresh database next to the live one. Searches keep using
+            # the live database untouched until the new one is complete.
+            self._remove_shadow()
+            shadow = CardDatabase(self._shadow_path(), build_indexes=False)
+
+            # Cards are stored as their original JSON text from the bulk file
+            entries = iter_json_array(spool, with_raw=True)
+            try:
+                shadow.bulk_import_raw(self._verified(entries, spool, expected_size), db_progress)
+            except Exception:
+                # A complete (or oversized) file failed to import: don't resume from it
+                if spool.done and not spool.error and (not expected_size or spool.written >= expected_size):
+                    keep_partial = False
+                raise
+
+            # Carry only the differences over to the live database
+            shadow.close()
+            progress_callback(100, 0, 0, "Applying changes...")
+            stats = self.db.apply_snapshot(self._shadow_path())
+            self.db.set_meta('bulk_updated_at', oracle_cards.get('updated_at'))
+            if stats['inserted'] or stats['updated'] or stats['deleted']:
+                self._notify_listeners()
+
+            keep_partial = False
+            self.save_state({
+                'updated_at': oracle_cards.get('updated_at'),
+                'download_uri': download_uri,
+                'etag': validators.get('etag'),
+                'last_modified': validators.get('last_modified'),
+                'size': spool.written,
+            })
+
+            completion_callback(True, "Database updated successfully.\n"
+                                      f"{stats['inserted']} new, {stats['updated']} changed, "
+                                      f"{stats['deleted']} removed, {stats['unchanged']} unchanged.")
+
         except Exception as e:
             print(f"Update failed: {e}")
             completion_callback(False, f"Update failed: {e}")
+        finally:
+            if spool:
+                spool.cancelled = True
+                if download_thread:
+                    download_thread.join()
+                spool.close(remove=not keep_partial)
+            if shadow:
+                shadow.close()
+                try:
+                    self._remove_shadow()
+                except OSError as e:
+                    print(f"Could not remove {self._shadow_path()}: {e}")
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from services.rate_limiter import request_priority, INTERACTIVE, BULK
+
+# Requests running at once per host; bulk jobs get their own, smaller share
+# so they never hold every slot an interactive request needs
+HOST_CONCURRENCY = 6
+BULK_CONCURRENCY = 4
+
+class FetchEngine:
+    """
+    Runs network jobs for the whole app from one asyncio event loop thread.
+    Jobs wait on the loop (not on OS threads) for a per-host slot, then run
+    on a small fixed pool that makes the actual requests through the shared
+    session, so its connection pool, rate limiter and cache apply.
+    submit()/call() can be used from any thread, including Tk's, and return
+    concurrent.futures.Future objects; cancelling one drops the job if it
+    hasn't started, and stops a download between chunks if it has.
+    """
+    WORKERS = 16
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, session=None, workers=WORKERS):
+        self.session = session if session else requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch")
+        self._slots = {}
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+
+    def call(self, func, *args, host=None, priority=INTERACTIVE):
+        """
+        Runs func(*args) under the host's concurrency limit. Requests func
+        makes use the given rate limiter priority. Returns a Future.
+        """
+        return asyncio.run_coroutine_threadsafe(self._run(host, priority, None, func, *args), self._loop)
+
+    def submit(self, url, callback=None, params=None, priority=INTERACTIVE, timeout=30):
+        """
+        GETs a url. Returns a Future for the requests.Response; callback, if
+        given, is called with the response (None on errors) on a worker
+        thread.
+        """
+        def fetch():
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+            except Exception as e:
+                print(f"Error fetching {url}: {e}")
+                response = None
+            if callback:
+                callback(response)
+            return response
+        return self.call(fetch, host=url, priority=priority)
+
+    def download(self, url, path, priority=BULK, timeout=30):
+        """
+        Streams a url to a file (written to path + ".part", then renamed).
+        The Future's result is True if the file was written.
+        """
+        cancelled = threading.Event()
+
+        def fetch():
+            part = path + ".part"
+            try:
+                with self.session.get(url, stream=True, timeout=timeout) as response:
+                    if response.status_code != 200:
+                        return False
+                    with open(part, "wb") as f:
+                        for chunk in response.iter_content(self.CHUNK_SIZE):
+                            if cancelled.is_set():
+                                break
+                            f.write(chunk)
+                if cancelled.is_set():
+                    os.remove(part)
+                    return False
+                os.replace(part, path)
+                return True
+            except Exception as e:
+                print(f"Failed to download {url}: {e}")
+                if os.path.exists(part):
+                    os.remove(part)
+                return False
+
+        future = asyncio.run_coroutine_threadsafe(self._run(url, priority, cancelled, fetch), self._loop)
+        future.add_done_callback(lambda f: cancelled.set() if f.cancelled() else None)
+        return future
+
+    async def _run(self, host, priority, cancelled, func, *args):
+        async with self._slot(host, priority):
+            loop = asyncio.get_running_loop()
+            work = loop.run_in_executor(self._executor, self._call_with_priority, priority, func, args)
+            try:
+                # shield: a cancelled job keeps its slot until the worker really finishes
+                return await asyncio.shield(work)
+            except asyncio.CancelledError:
+                if cancelled:
+                    cancelled.set()
+                await asyncio.wait([work])
+                raise
+
+    def _slot(self, host, priority):
+        if host and '/' in host:
+            host = urlparse(host).hostname
+        key = (host, priority >= BULK)
+        if key not in self._slots:
+            self._slots[key] = asyncio.Semaphore(BULK_CONCURRENCY if priority >= BULK else HOST_CONCURRENCY)
+        return self._slots[key]
+
+    @staticmethod
+    def _call_with_priority(priority, func, args):
+        with request_priority(priority):
+            return func(*args)
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._executor.shutdown(wait=False, cancel_futures=True)
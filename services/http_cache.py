@@ -0,0 +1,242 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from services.rate_limiter import RateLimitedAdapter, RateLimiter
+
+# URL prefix -> seconds a response stays fresh, whatever the server says.
+# 0 means never cache. The longest matching prefix wins.
+DEFAULT_TTLS = {
+    # Same lifetime SearchService gives API results in memory
+    'https://api.scryfall.com/cards/search': 600,
+    'https://api.scryfall.com/cards/named': 86400,
+    'https://api.scryfall.com/catalog/': 86400,
+    'https://json.edhrec.com/': 86400,
+    # DataUpdater compares updated_at itself; a stale answer would skip an update
+    'https://api.scryfall.com/bulk-data': 0,
+    # ImageService keeps its own image files, bulk files are far too big
+    'https://cards.scryfall.io/': 0,
+    'https://data.scryfall.io/': 0,
+}
+
+_MAX_AGE_RE = re.compile(r'max-age\s*=\s*(\d+)')
+
+def _freshness(headers):
+    """
+    Seconds a response may be used without revalidating according to its
+    Cache-Control / Expires headers, 0 to always revalidate, or None if it
+    must not be stored.
+    """
+    cache_control = headers.get('Cache-Control', '').lower()
+    if 'no-store' in cache_control or 'private' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0
+    match = _MAX_AGE_RE.search(cache_control)
+    if match:
+        return int(match.group(1))
+    if headers.get('Expires'):
+        try:
+            return max(0, parsedate_to_datetime(headers['Expires']).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0
+    # Validators alone are still worth keeping: revalidating is cheaper than downloading
+    if headers.get('ETag') or headers.get('Last-Modified'):
+        return 0
+    return None
+
+class HttpCache:
+    """
+    GET responses stored in a SQLite file, keyed by URL. Entries are used
+    while fresh and revalidated with ETag / Last-Modified once stale. The
+    file is kept under max_bytes by dropping the least recently used
+    entries.
+    """
+    def __init__(self, db_path="http_cache.db", max_bytes=64 * 1024 * 1024, ttls=None):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            status INTEGER,
+            headers TEXT,
+            body BLOB,
+            etag TEXT,
+            last_modified TEXT,
+            expires REAL,
+            last_used REAL,
+            size INTEGER
+        )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def ttl_for(self, url):
+        """The TTL override for a URL (longest matching prefix), or None to follow the headers."""
+        best = None
+        for prefix, ttl in self.ttls.items():
+            if url.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.ttls[best] if best is not None else None
+
+    def get(self, url):
+        """Returns the stored entry as a dict (with 'fresh' set), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body, etag, last_modified, expires FROM responses WHERE url = ?",
+                (url,)).fetchone()
+            if not row:
+                return None
+            now = time.time()
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE url = ?", (now, url))
+            self._conn.commit()
+        status, headers, body, etag, last_modified, expires = row
+        return {
+            'status': status, 'headers': json.loads(headers), 'body': body,
+            'etag': etag, 'last_modified': last_modified, 'fresh': expires > now,
+        }
+
+    def put(self, url, response, lifetime):
+        """Stores a response that stays fresh for `lifetime` seconds."""
+        body = response.content
+        size = len(body) + len(url)
+        # One response may not take more than a quarter of the cache
+        if size > self.max_bytes // 4:
+            return
+        headers = {key: value for key, value in response.headers.items()
+                   if key.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')}
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.status_code, json.dumps(headers), body, response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'), now + lifetime, now, size))
+            self._size += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def refresh(self, url, lifetime):
+        """Marks an entry fresh again after the server confirmed it (304)."""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET expires = ? WHERE url = ?", (time.time() + lifetime, url))
+            self._conn.commit()
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, size FROM responses ORDER BY last_used LIMIT 32").fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for url, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._size -= size
+                self.evictions += 1
+                if self._size <= self.max_bytes:
+                    return
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self):
+        lookups = self.hits + self.revalidated + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses,
+            'hit_ratio': (self.hits + self.revalidated) / lookups if lookups else 0.0,
+            'evictions': self.evictions, 'entries': entries, 'bytes': self._size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CachingAdapter(RateLimitedAdapter):
+    """
+    RateLimitedAdapter that answers GETs from an HttpCache. Fresh entries
+    never reach the network (or the rate limiter); stale ones are sent as
+    conditional requests and reused on a 304.
+    Streamed and ranged requests always go to the network.
+    """
+    def __init__(self, cache, limiter=None, **kwargs):
+        super().__init__(limiter, **kwargs)
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        ttl = self.cache.ttl_for(request.url)
+        if (request.method != 'GET' or kwargs.get('stream') or ttl == 0
+                or 'Range' in request.headers or 'If-None-Match' in request.headers):
+            return super().send(request, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if entry and entry['fresh']:
+            self.cache.hits += 1
+            return self._cached_response(request, entry)
+
+        if entry and (entry['etag'] or entry['last_modified']):
+            conditional = request.copy()
+            if entry['etag']:
+                conditional.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                conditional.headers['If-Modified-Since'] = entry['last_modified']
+            response = super().send(conditional, **kwargs)
+            if response.status_code == 304:
+                lifetime = ttl if ttl is not None else (_freshness(response.headers) or 0)
+                response.close()
+                self.cache.refresh(request.url, lifetime)
+                self.cache.revalidated += 1
+                return self._cached_response(request, entry)
+        else:
+            response = super().send(request, **kwargs)
+
+        self.cache.misses += 1
+        if response.status_code == 200:
+            lifetime = ttl if ttl is not None else _freshness(response.headers)
+            if lifetime is not None:
+                self.cache.put(request.url, response, lifetime)
+        return response
+
+    def _cached_response(self, request, entry):
+        response = Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK'
+        response.elapsed = timedelta(0)
+        response.connection = self
+        response.from_cache = True
+        return response
+
+def install_http_cache(session, cache, limits=None):
+    """
+    Mounts a CachingAdapter (which also rate limits, see install_rate_limiter)
+    on the session for http and https. Returns the session.
+    """
+    adapter = CachingAdapter(cache, RateLimiter(limits))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
@@ -1,13 +1,18 @@
 import os
 import hashlib
-import threading
+from concurrent.futures import wait, FIRST_COMPLETED
 from io import BytesIO
 from PIL import Image, ImageTk
 import requests
 
 class ImageService:
-    def __init__(self, session, cache_dir="image_cache"):
+    # Bulk downloads queued on the fetch engine at once
+    DOWNLOAD_WINDOW = 64
+
+    def __init__(self, session, engine, cache_dir="image_cache"):
+        # engine: the FetchEngine shared with the search service
         self.session = session
+        self.engine = engine
         self.cache_dir = cache_dir
         self.image_cache = {} # Memory cache
         
@@ -30,7 +35,7 @@ class ImageService:
             callback(self.image_cache[url])
             return
 
-        threading.Thread(target=self._load_image_thread, args=(url, callback, height), daemon=True).start()
+        self.engine.call(self._load_image_thread, url, callback, height, host=url)
 
     def _get_cache_path(self, url):
         file_extension = os.path.splitext(url)[1]
@@ -90,6 +95,33 @@ class ImageService:
             except Exception as e:
                 print(f"Failed to download {url}: {e}")
 
+    def download_images(self, urls, should_stop=None):
+        """
+        Downloads images to the cache, several at a time on the fetch engine.
+        urls can be a generator; it is consumed as downloads finish.
+        should_stop: function checked between downloads; queued ones are
+        cancelled once it returns True. Returns the number of files written.
+        """
+        pending = set()
+        written = 0
+        for url in urls:
+            if should_stop and should_stop():
+                break
+            file_path = self._get_cache_path(url)
+            if os.path.exists(file_path):
+                continue
+            pending.add(self.engine.download(url, file_path))
+            if len(pending) >= self.DOWNLOAD_WINDOW:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written += sum(1 for future in done if future.result())
+
+        if should_stop and should_stop():
+            for future in pending:
+                future.cancel()
+        done, _ = wait(pending)
+        written += sum(1 for future in done if not future.cancelled() and future.result())
+        return written
+
     def get_card_image_urls(self, card):
         """
         Extract all image URLs from a card object.
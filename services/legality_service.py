@@ -2,6 +2,8 @@ import json
 import os
 import threading
 
+from services.rate_limiter import request_priority, BACKGROUND
+
 class LegalityService:
     def __init__(self, session):
         self.session = session
@@ -24,7 +26,8 @@ class LegalityService:
         url = "https://api.scryfall.com/cards/search?q=banned:commander&unique=cards"
         try:
             while url:
-                r = self.session.get(url)
+                with request_priority(BACKGROUND):
+                    r = self.session.get(url)
                 if r.status_code != 200:
                     print(f"Failed to fetch banlist: {r.status_code}")
                     break
@@ -0,0 +1,70 @@
+import bisect
+import time
+
+from database import normalize_name, ALL_COLORS_MASK
+
+class NameIndex:
+    """
+    In-memory index of card names for search-as-you-type.
+    Names are matched on their normalized form (see normalize_name) by
+    prefix ("light" -> "Lightning Bolt") and by word start ("bolt" ->
+    "Lightning Bolt"), using binary search over sorted lists.
+    Each name also keeps its color identity mask, so lookups for a
+    commander's legal pool skip other names without touching the database.
+    """
+    def __init__(self, db):
+        self.db = db
+        # (sorted keys, names, masks, sorted word-start keys, names, masks);
+        # names and masks are parallel to the keys before them
+        self._data = ([], [], [], [], [], [])
+        self.loaded = False
+
+    def load(self):
+        """Reads all card names from the database. Safe to call while lookups run."""
+        start = time.time()
+        entries = self.db.get_name_keys()
+
+        entries.sort()
+
+        # Every word after the first, with the rest of the name
+        word_entries = []
+        for key, name, mask in entries:
+            pos = key.find(' ')
+            while pos != -1:
+                word_entries.append((key[pos + 1:], name, mask))
+                pos = key.find(' ', pos + 1)
+        word_entries.sort()
+
+        # Swap in one assignment so lookups never see a half-built index
+        self._data = ([key for key, _, _ in entries], [name for _, name, _ in entries],
+                      [mask for _, _, mask in entries],
+                      [key for key, _, _ in word_entries], [name for _, name, _ in word_entries],
+                      [mask for _, _, mask in word_entries])
+        self.loaded = True
+        print(f"Name index: {len(entries)} names loaded in {time.time() - start:.2f}s")
+
+    def __len__(self):
+        return len(self._data[0])
+
+    def iter_matches(self, query, allowed_mask=ALL_COLORS_MASK):
+        """
+        Yields matching card names: names starting with the query first,
+        then names with a later word starting with it, each alphabetically.
+        allowed_mask: only names whose color identity fits within this mask.
+        """
+        key = normalize_name(query)
+        if not key:
+            return
+        keys, names, masks, word_keys, word_names, word_masks = self._data
+        outside = ALL_COLORS_MASK & ~allowed_mask
+
+        seen = set()
+        for sorted_keys, sorted_names, sorted_masks in ((keys, names, masks),
+                                                        (word_keys, word_names, word_masks)):
+            i = bisect.bisect_left(sorted_keys, key)
+            while i < len(sorted_keys) and sorted_keys[i].startswith(key):
+                name = sorted_names[i]
+                if not sorted_masks[i] & outside and name not in seen:
+                    seen.add(name)
+                    yield name
+                i += 1
@@ -0,0 +1,168 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+# Request priorities, lowest value first: a search or image the user is
+# waiting on goes ahead of background refreshes and bulk downloads
+INTERACTIVE = 0
+BACKGROUND = 1
+BULK = 2
+
+# host -> (requests per second, burst)
+DEFAULT_LIMITS = {
+    # Scryfall asks for 50-100 ms between API requests
+    'api.scryfall.com': (10, 2),
+    'cards.scryfall.io': (20, 10),
+    'json.edhrec.com': (5, 2),
+}
+
+_local = threading.local()
+
+@contextmanager
+def request_priority(priority):
+    """Requests made by this thread inside the block use the given priority."""
+    previous = getattr(_local, 'priority', INTERACTIVE)
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+def current_priority():
+    return getattr(_local, 'priority', INTERACTIVE)
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average and up to `burst` at once.
+    Threads waiting for a token are served by priority, then in arrival order.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority=INTERACTIVE):
+        """Blocks until this thread may send a request."""
+        ticket = (priority, next(self._counter))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    # Only the first waiter in line watches the clock; the rest
+                    # sleep until the line moves
+                    timeout = None
+                    if self._waiters[0] == ticket:
+                        timeout = self._time_to_token()
+                        if timeout <= 0:
+                            self.tokens -= 1
+                            return
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Stops handing out tokens for a while (the server asked us to back off)."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self._cond.notify_all()
+
+    def _time_to_token(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    """One token bucket per host. Hosts without a configured limit aren't limited."""
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        if host not in self.limits:
+            return None
+        with self._lock:
+            if host not in self._buckets:
+                rate, burst = self.limits[host]
+                self._buckets[host] = TokenBucket(rate, burst)
+            return self._buckets[host]
+
+def retry_after_seconds(response):
+    """Parses a Retry-After header (seconds or an HTTP date). Returns None if missing or invalid."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    Transport adapter that takes a token from the host's bucket before every
+    request and retries throttled requests (429, 503), waiting for the
+    Retry-After the server sent or with exponential backoff. While waiting
+    the whole host is paused, so other threads back off too.
+    """
+    RETRY_STATUSES = (429, 503)
+    MAX_RETRIES = 4
+    BACKOFF_BASE = 1.0
+    MAX_BACKOFF = 60.0
+
+    def __init__(self, limiter=None, **kwargs):
+        super().__init__(**kwargs)
+        self.limiter = limiter if limiter else RateLimiter()
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).hostname
+        bucket = self.limiter.bucket(host)
+        priority = current_priority()
+        attempt = 0
+        while True:
+            if bucket:
+                bucket.acquire(priority)
+            response = super().send(request, **kwargs)
+            if response.status_code not in self.RETRY_STATUSES or attempt >= self.MAX_RETRIES:
+                return response
+
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = min(self.MAX_BACKOFF, self.BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"{host} returned {response.status_code}, retrying in {delay:.1f}s")
+            response.close()
+            if bucket:
+                bucket.pause(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+def install_rate_limiter(session, limits=None):
+    """Mounts a RateLimitedAdapter on the session for http and https. Returns the session."""
+    adapter = RateLimitedAdapter(RateLimiter(limits))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
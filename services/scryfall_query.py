@@ -0,0 +1,225 @@
+import re
+
+from database import color_mask, ALL_COLORS_MASK
+from services.card_filters import escape_like
+
+class UnsupportedQuery(ValueError):
+    """The query uses syntax the local database can't answer; ask the API instead."""
+
+COLOR_NAMES = {
+    'white': 'W', 'blue': 'U', 'black': 'B', 'red': 'R', 'green': 'G', 'colorless': '',
+}
+
+# Scryfall keyword aliases -> canonical keyword
+KEYWORDS = {
+    't': 'type', 'type': 'type',
+    'o': 'oracle', 'oracle': 'oracle',
+    'id': 'identity', 'identity': 'identity', 'ci': 'identity', 'commander': 'identity',
+    'mv': 'mv', 'cmc': 'mv', 'manavalue': 'mv',
+    's': 'set', 'set': 'set', 'e': 'set', 'edition': 'set',
+    'is': 'is', 'game': 'game', 'border': 'border', 'name': 'name',
+}
+
+# is: values -> SQL condition on the filter columns
+IS_CONDITIONS = {
+    'playtest': "promo_types LIKE '%,playtest,%'",
+    'oversized': "oversized = 1",
+    'funny': "set_type = 'funny'",
+    # Same approximation the search filters use for Universes Beyond
+    'ub': "security_stamp = 'triangle'",
+    'universesbeyond': "security_stamp = 'triangle'",
+}
+
+_TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<paren>[()])
+      | (?P<neg>-)(?=\S)
+      | (?P<exact>!)?
+        (?:(?P<key>[a-zA-Z]+)(?P<op>>=|<=|!=|:|=|<|>))?
+        (?:"(?P<quoted>[^"]*)"? | (?P<word>[^\s()"]+))
+    )''', re.VERBOSE)
+
+def _tokenize(query):
+    """
+    Splits a query into ('(' | ')' | '-' | 'or' | 'and', None) and
+    ('term', (key, op, value, exact)) tokens. key is None for bare names.
+    """
+    tokens = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        match = _TOKEN_RE.match(query, pos)
+        if not match or match.end() == pos:
+            raise UnsupportedQuery(f"Cannot parse {query[pos:]!r}")
+        pos = match.end()
+        if match.group('paren'):
+            tokens.append((match.group('paren'), None))
+        elif match.group('neg'):
+            tokens.append(('-', None))
+        else:
+            value = match.group('quoted') if match.group('quoted') is not None else match.group('word')
+            key = match.group('key')
+            if not key and match.group('word') and re.search(r'[:<>=]', value):
+                raise UnsupportedQuery(f"Unsupported term {value!r}")
+            if not key and not match.group('exact') and match.group('quoted') is None \
+                    and value.lower() in ('or', 'and'):
+                tokens.append((value.lower(), None))
+            else:
+                tokens.append(('term', (key.lower() if key else None, match.group('op'),
+                                        value, bool(match.group('exact')))))
+        # Skip trailing whitespace so the loop ends on the last token
+        while pos < len(query) and query[pos].isspace():
+            pos += 1
+    return tokens
+
+def _parse_colors(value):
+    value = value.lower()
+    if value in COLOR_NAMES:
+        return set(COLOR_NAMES[value])
+    if value and all(c in 'wubrgc' for c in value):
+        return set(value.upper().replace('C', ''))
+    raise UnsupportedQuery(f"Unsupported colors {value!r}")
+
+def _identity_condition(op, value):
+    mask = color_mask(_parse_colors(value))
+    outside = ALL_COLORS_MASK & ~mask
+
+    # For identity, ":" means "fits in a deck of these colors"
+    if op in (":", "<="):
+        return "color_mask & ? = 0", [outside]
+    if op == ">=":
+        return "color_mask & ? = ?", [mask, mask]
+    if op == "=":
+        return "color_mask = ?", [mask]
+    if op == "<":
+        return "color_mask & ? = 0 AND color_mask != ?", [outside, mask]
+    if op == ">":
+        return "color_mask & ? = ? AND color_mask != ?", [mask, mask, mask]
+    return "color_mask != ?", [mask]
+
+def _mv_condition(op, value):
+    # "mv:>=3" puts the comparison after the colon
+    if op == ":":
+        for candidate in (">=", "<=", "!=", "=", "<", ">"):
+            if value.startswith(candidate):
+                op, value = candidate, value[len(candidate):]
+                break
+        else:
+            op = "="
+    try:
+        number = float(value)
+    except ValueError:
+        raise UnsupportedQuery(f"Unsupported mana value {value!r}")
+    return f"cmc {op} ?", [number]
+
+def _term_condition(key, op, value, exact):
+    if key is None:
+        if exact:
+            return "name = ? COLLATE NOCASE", [value]
+        return "name LIKE ? ESCAPE '\\'", [f"%{escape_like(value)}%"]
+
+    keyword = KEYWORDS.get(key)
+    if keyword is None:
+        raise UnsupportedQuery(f"Unsupported keyword {key!r}")
+
+    if keyword == 'identity':
+        return _identity_condition(op, value)
+    if keyword == 'mv':
+        return _mv_condition(op, value)
+
+    # Everything else only supports ":" / "="
+    if op not in (":", "="):
+        raise UnsupportedQuery(f"Unsupported operator {key}{op}")
+    value_lower = value.lower()
+
+    if keyword == 'type':
+        return "type_lines LIKE ? ESCAPE '\\'", [f"%{escape_like(value)}%"]
+    if keyword == 'oracle':
+        return "oracle_text LIKE ? ESCAPE '\\'", [f"%{escape_like(value)}%"]
+    if keyword == 'name':
+        return "name LIKE ? ESCAPE '\\'", [f"%{escape_like(value)}%"]
+    if keyword == 'set':
+        return "set_code = ?", [value_lower]
+    if keyword == 'game':
+        return "games LIKE ?", [f"%,{escape_like(value_lower)},%"]
+    if keyword == 'border':
+        return "border_color = ?", [value_lower]
+    if keyword == 'is':
+        if value_lower not in IS_CONDITIONS:
+            raise UnsupportedQuery(f"Unsupported is:{value}")
+        return IS_CONDITIONS[value_lower], []
+    raise UnsupportedQuery(f"Unsupported keyword {key!r}")
+
+class _Parser:
+    """
+    Recursive descent over the tokens:
+        or_expr  := and_expr ("or" and_expr)*
+        and_expr := unary (["and"] unary)*
+        unary    := "-" unary | "(" or_expr ")" | term
+    """
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        sql, params = self.or_expr()
+        if self.peek() is not None:
+            raise UnsupportedQuery("Unbalanced parentheses")
+        return sql, params
+
+    def or_expr(self):
+        parts = [self.and_expr()]
+        while self.peek() == 'or':
+            self.next()
+            parts.append(self.and_expr())
+        return self._join(parts, " OR ")
+
+    def and_expr(self):
+        parts = [self.unary()]
+        while self.peek() not in (None, ')', 'or'):
+            if self.peek() == 'and':
+                self.next()
+            parts.append(self.unary())
+        return self._join(parts, " AND ")
+
+    def unary(self):
+        kind, value = self.next() if self.peek() is not None else (None, None)
+        if kind == '-':
+            sql, params = self.unary()
+            return f"NOT ({sql})", params
+        if kind == '(':
+            result = self.or_expr()
+            if self.peek() != ')':
+                raise UnsupportedQuery("Unbalanced parentheses")
+            self.next()
+            return result
+        if kind == 'term':
+            return _term_condition(*value)
+        raise UnsupportedQuery("Incomplete query")
+
+    def _join(self, parts, operator):
+        if len(parts) == 1:
+            return parts[0]
+        sql = operator.join(f"({part_sql})" for part_sql, _ in parts)
+        params = [param for _, part_params in parts for param in part_params]
+        return sql, params
+
+def compile_query(query):
+    """
+    Compiles a Scryfall search query into a SQL condition on the cards
+    filter columns. Returns (sql, params).
+    Raises UnsupportedQuery for anything the local database can't answer
+    exactly (unknown keywords, regexes, colors other than identity, ...).
+    """
+    tokens = _tokenize(query)
+    if not tokens:
+        raise UnsupportedQuery("Empty query")
+    return _Parser(tokens).parse()
@@ -1,187 +1,300 @@
 import threading
 import json
 import os
+import time
 import requests
+from collections import namedtuple, OrderedDict
+
+from database import ALL_COLORS_MASK, QueryCancelled
+from services.card_filters import CardFilter
+from services.scryfall_query import compile_query, UnsupportedQuery
+
+class _ResultCache:
+    """
+    Least-recently-used cache of search result pages, bounded to
+    max_entries. Entries put with a ttl (seconds) expire after it.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or time.monotonic() < expires:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+def _cache_query(query):
+    # SQLite and Scryfall ignore extra whitespace and ASCII case in the query
+    query = ' '.join(query.split())
+    return query.lower() if query.isascii() else query
+
+# Where a local search continues: passed back to load_more as next_page
+LocalPage = namedtuple('LocalPage', ['query', 'filters', 'after'])
 
 class SearchService:
-    def __init__(self, db, session, ub_sets_config):
+    # Cards per page of local results (Scryfall pages are 175 cards)
+    PAGE_SIZE = 100
+    # A search is held this long before it starts, so one issued right
+    # after it (e.g. a double click on Search) replaces it instead
+    DEBOUNCE_SECONDS = 0.05
+    # Result pages kept in the search cache (local and Scryfall)
+    CACHE_ENTRIES = 64
+    # Scryfall results can change without a local database update
+    API_CACHE_TTL = 600
+    API_SEARCH_URL = "https://api.scryfall.com/cards/search"
+
+    def __init__(self, db, session, ub_sets_config, engine, name_index=None):
+        # engine: the FetchEngine shared by all services; prints lookups run on it
         self.db = db
         self.session = session
+        self.engine = engine
         self.ub_sets_config = ub_sets_config
+        self.name_index = name_index
+
+        # Searches run one at a time on a single worker thread, which hands
+        # Scryfall requests on to the fetch engine. Each one gets
+        # the next generation number; anything older than the current
+        # generation is stale and gets cancelled or dropped.
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._pending = None
+        self._worker = None
+
+        self._cache = _ResultCache(self.CACHE_ENTRIES)
 
     def search(self, query, filters, callback):
         """
-        Initiates a search.
-        callback: function(status_code, data)
+        Initiates a search. A search still waiting to run is replaced and a
+        running one is cancelled; only the latest search calls back.
+        callback: function(status_code, data), with the first page of cards
+        in data['data']. If data['has_more'] is set, pass data['next_page']
+        to load_more for the next page.
         """
-        threading.Thread(target=self._search_logic, args=(query, filters, callback), daemon=True).start()
+        self._submit(self._search_logic, callback, query, filters)
 
-    def _search_logic(self, query, filters, callback):
-        # If query has syntax (:) assume advanced search and go to API
-        # Otherwise try local DB first if populated
-        
-        use_local = ':' not in query and self.db.count() > 0
-        
-        if use_local:
-            # Define filter function for local DB
-            def local_filter(card):
-                return self._check_card_against_filters(card, filters)
+    def load_more(self, next_page, callback):
+        """
+        Fetches the page after a search result (its data['next_page']) and
+        calls back like search. It replaces waiting and running searches
+        the same way.
+        """
+        self._submit(self._load_more_logic, callback, next_page)
 
-            # Pass filter function to DB search
-            local_results = self.db.search_cards(query, limit=100, filter_func=local_filter)
-            
-            callback(200, {'data': local_results})
-            return
+    def clear_cache(self):
+        """Forgets all cached results, e.g. after the card database changed."""
+        self._cache.clear()
 
-        self._search_api(query, filters, callback)
+    def cache_stats(self):
+        """Returns the result cache's {'hits', 'misses', 'entries'}."""
+        return self._cache.stats()
 
-    def _check_card_against_filters(self, card, filters):
-        prefs = filters.get('prefs', {})
-        
-        # Build known sets from config
-        known_ub_sets = set()
-        ub_key_map = {} 
-        for _, key, codes in self.ub_sets_config:
-            for c in codes:
-                known_ub_sets.add(c)
-                ub_key_map[c] = key
-
-        # 0. Commander Identity
-        if 'commander_identity' in filters:
-            card_id = set(card.get('color_identity', []))
-            cmd_id = set(filters['commander_identity'])
-            if not card_id.issubset(cmd_id):
-                return False
-
-        # 1. Colors
-        if 'colors' in filters:
-            card_id = set(card.get('color_identity', []))
-            selected_id = set(filters['colors'])
-            if not card_id.issubset(selected_id):
-                return False
-
-        # 2. Type
-        if 'type' in filters:
-            t_filter = filters['type'].lower()
-            t_line = card.get('type_line', '').lower()
-            if 'card_faces' in card:
-                match = False
-                for face in card['card_faces']:
-                    if t_filter in face.get('type_line', '').lower():
-                        match = True
-                        break
-                if not match and t_filter not in t_line: 
-                    return False
-            else:
-                if t_filter not in t_line:
-                    return False
-
-        # 2.1 Subtype
-        if 'subtype' in filters:
-            # Handle comma separated list
-            subtypes = [s.strip().lower() for s in filters['subtype'].split(',') if s.strip()]
-            t_line = card.get('type_line', '').lower()
-            
-            match_all = True
-            for s_filter in subtypes:
-                if 'card_faces' in card:
-                    face_match = False
-                    for face in card['card_faces']:
-                        if s_filter in face.get('type_line', '').lower():
-                            face_match = True
-                            break
-                    if not face_match and s_filter not in t_line:
-                        match_all = False
-                        break
-                else:
-                    if s_filter not in t_line:
-                        match_all = False
+    def cancel(self):
+        """Cancels the running search and drops any waiting one."""
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+            self._cond.notify()
+
+    def _submit(self, task, callback, *args):
+        with self._cond:
+            self._generation += 1
+            self._pending = (self._generation, task, callback, args)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_searches, daemon=True)
+                self._worker.start()
+            self._cond.notify()
+
+    def _run_searches(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._pending is None:
+                        self._cond.wait()
+                    request = self._pending
+                    self._cond.wait(self.DEBOUNCE_SECONDS)
+                    if self._pending is request:
+                        self._pending = None
                         break
-            
-            if not match_all:
-                return False
-
-        # 2.2 CMC
-        if 'cmc' in filters:
-            if not self._check_cmc(card.get('cmc', 0), filters['cmc']):
-                return False
-
-        # 2.3 Text
-        if 'text' in filters:
-            words = filters['text'].lower().split()
-            oracle_text = card.get('oracle_text', '').lower()
-            
-            if 'card_faces' in card:
-                # For DFCs, check if ALL words appear in EITHER face (or combined?)
-                # Usually we want to find a card where the words appear somewhere.
-                # But if I search "enter battlefield", I expect them to be on the same face?
-                # Scryfall logic: o:foo o:bar -> foo and bar must be on the card.
-                # For DFCs, if one face has foo and other has bar, does it match?
-                # Scryfall says yes for "c:w c:u" (color), but for text?
-                # Let's assume we check if all words are present in the combined text of the card.
-                
-                combined_text = " ".join([face.get('oracle_text', '').lower() for face in card['card_faces']])
-                for w in words:
-                    if w not in combined_text:
-                        return False
-            else:
-                for w in words:
-                    if w not in oracle_text:
-                        return False
 
-        # 3. Preferences
-        
-        # Alchemy / Paper
-        if not prefs.get('include_alchemy', False):
-            if 'paper' not in card.get('games', []):
-                return False
-        
-        # Silver Border
-        if not prefs.get('include_silver', False):
-            if card.get('border_color') == 'silver':
-                return False
-        
-        # Playtest
-        if not prefs.get('include_playtest', False):
-            if card.get('set_type') == 'memorabilia' or 'playtest' in card.get('promo_types', []):
-                return False
-
-        # Oversized
-        if not prefs.get('include_oversized', False):
-            if card.get('oversized', False):
-                return False
-
-        # Funny
-        if not prefs.get('include_funny', False):
-            if card.get('set_type') == 'funny':
-                return False
-
-        # Universes Beyond
-        is_ub = False
-        if card.get('security_stamp') == 'triangle':
-            is_ub = True
-        
-        card_set = card.get('set', '').lower()
-        
-        # Check specific sets
-        excluded_ub = False
-        
-        if card_set in ub_key_map:
-            is_ub = True
-            key = ub_key_map[card_set]
-            if not prefs.get(key, True):
-                excluded_ub = True
-        
-        if excluded_ub:
-            return False
-            
-        # Check "Other"
-        if is_ub and card_set not in known_ub_sets:
-            if not prefs.get('ub_other', True):
-                return False
+            generation, task, callback, args = request
+            cancelled, deliver = self._bind(generation, callback)
+            try:
+                task(cancelled, deliver, *args)
+            except QueryCancelled:
+                pass
+            except Exception as e:
+                print(f"Error in search: {e}")
+
+    def _bind(self, generation, callback):
+        """
+        Returns (cancelled, deliver) for one search; they stay bound to it
+        when the search finishes on the fetch engine after newer ones started.
+        """
+        def cancelled():
+            return generation != self._generation
+
+        def deliver(status_code, data):
+            # Results of a superseded search are dropped
+            if not cancelled():
+                callback(status_code, data)
+        return cancelled, deliver
+
+    def _search_logic(self, cancelled, deliver, query, filters):
+        # Try local DB first if populated. Queries with syntax (:) are
+        # answered locally when every term is supported, otherwise by the API.
+        if self.db.count() > 0:
+            try:
+                deliver(200, self._local_page(LocalPage(query, filters, None), cancelled))
+                return
+            except UnsupportedQuery as e:
+                print(f"Searching Scryfall instead: {e}")
 
+        self._run_api(cancelled, self._search_api, query, filters, deliver)
+
+    def _load_more_logic(self, cancelled, deliver, next_page):
+        if isinstance(next_page, LocalPage):
+            deliver(200, self._local_page(next_page, cancelled))
+            return
+
+        # Scryfall's next_page URL
+        def load_more():
+            try:
+                deliver(*self._get_api_page(next_page))
+            except Exception as e:
+                print(f"Error loading more results: {e}")
+                deliver(500, {})
+        self._run_api(cancelled, load_more)
+
+    def _run_api(self, cancelled, func, *args):
+        """
+        Runs a Scryfall request on the fetch engine, so rate limiter waits
+        and retries never hold up the searches after it on the worker. A
+        newer search drops its results through deliver, like local ones.
+        """
+        def run():
+            # Superseded while waiting for a slot: skip the request
+            if not cancelled():
+                func(*args)
+        if not cancelled():
+            self.engine.call(run, host=self.API_SEARCH_URL)
+
+    def _local_page(self, page, cancelled):
+        """
+        Runs one page of a local search. Returns the data dict for the
+        search callback. Raises UnsupportedQuery for syntax the local
+        database can't answer.
+        """
+        query, filters, after = page
+
+        # Filters run in SQL; without the full-text index the text
+        # filter falls back to checking the card JSON
+        card_filter = CardFilter.compile(filters, self.ub_sets_config)
+        where, params = card_filter.to_sql(use_fts=self.db.has_fts)
+
+        local_filter = None
+        if card_filter.text_words and not self.db.has_fts:
+            local_filter = card_filter.matches_text
+
+        # Compiled first so queries that need the API never count as cache misses
+        if ':' in query:
+            query_where, query_params = compile_query(query)
+            if where:
+                query_where = f"({query_where}) AND ({where})"
+
+        # The compiled filter is the canonical form of the filters: settings
+        # that filter the same way share cache entries. Any change to the
+        # cards (e.g. one saved from the API) bumps data_version.
+        cache_key = ('local', self.db.get_meta('data_version', 0), _cache_query(query), card_filter, after)
+        data = self._cache.get(cache_key)
+        if data is not None:
+            return data
+
+        if ':' not in query:
+            cards, next_after = self.db.search_cards_page(query, self.PAGE_SIZE, filter_func=local_filter,
+                                                          where=where, params=params,
+                                                          cancelled=cancelled, after=after)
+        else:
+            cards, next_after = self.db.query_cards_page(query_where, [*query_params, *params], self.PAGE_SIZE,
+                                                         filter_func=local_filter, cancelled=cancelled,
+                                                         after=after)
+
+        data = {
+            'data': cards,
+            'has_more': next_after is not None,
+            'next_page': LocalPage(query, filters, next_after) if next_after is not None else None,
+        }
+        self._cache.put(cache_key, data)
+        return data
+
+    def _get_api_page(self, url, params=None):
+        """GETs a page of Scryfall results through the cache. Returns (status_code, data)."""
+        # Only the cache key is normalized; Scryfall gets the query unchanged
+        key_params = None
+        if params:
+            key_params = tuple(sorted((key, _cache_query(value) if key == 'q' else value)
+                                      for key, value in params.items()))
+        cache_key = ('api', url, key_params)
+        data = self._cache.get(cache_key)
+        if data is not None:
+            return 200, data
+
+        response = self.session.get(url, params=params, timeout=10)
+        data = response.json()
+        if response.status_code == 200:
+            self._cache.put(cache_key, data, ttl=self.API_CACHE_TTL)
+        return response.status_code, data
+
+    def suggest(self, query, filters, callback, limit=100):
+        """
+        Search-as-you-type: cards whose name (or a word in it) starts with
+        the query, filtered like a local search. Runs on the search worker,
+        so it replaces and is replaced by searches the same way, and calls
+        back like search with the cards in data['data'].
+        Returns False without calling back if the query needs a full search
+        instead (API syntax, name index not loaded, text filter without
+        full-text index).
+        """
+        if ':' in query or not self.name_index or not self.name_index.loaded:
+            return False
+        if 'text' in filters and not self.db.has_fts:
+            return False
+        self._submit(self._suggest_logic, callback, query, filters, limit)
         return True
 
+    def _suggest_logic(self, cancelled, deliver, query, filters, limit):
+        card_filter = CardFilter.compile(filters, self.ub_sets_config)
+        where, params = card_filter.to_sql()
+        # Names outside the allowed colors are skipped before reaching SQL
+        allowed_mask = card_filter.allowed_mask if card_filter.allowed_mask is not None else ALL_COLORS_MASK
+        names = self.name_index.iter_matches(query, allowed_mask)
+        deliver(200, {'data': self.db.filter_names(names, where, params, limit=limit, cancelled=cancelled)})
+
     def _search_api(self, query, filters, callback):
         try:
             # Build query parts
@@ -283,38 +396,11 @@ class SearchService:
             print(f"Search Query: {full_query}")
             
             params = {'q': full_query}
-            response = self.session.get("https://api.scryfall.com/cards/search", params=params, timeout=10)
-            data = response.json()
-
-            callback(response.status_code, data)
+            callback(*self._get_api_page(self.API_SEARCH_URL, params))
         except Exception as e:
             print(f"Error searching: {e}")
             callback(500, {})
 
-    def _check_cmc(self, card_cmc, filter_str):
-        try:
-            filter_str = filter_str.strip()
-            if filter_str.startswith(">="):
-                val = float(filter_str[2:])
-                return card_cmc >= val
-            elif filter_str.startswith("<="):
-                val = float(filter_str[2:])
-                return card_cmc <= val
-            elif filter_str.startswith(">"):
-                val = float(filter_str[1:])
-                return card_cmc > val
-            elif filter_str.startswith("<"):
-                val = float(filter_str[1:])
-                return card_cmc < val
-            elif filter_str.startswith("="):
-                val = float(filter_str[1:])
-                return card_cmc == val
-            else:
-                val = float(filter_str)
-                return card_cmc == val
-        except ValueError:
-            return True # Ignore invalid filter
-
     def get_creature_types(self):
         cache_file = "creature_types.json"
         if os.path.exists(cache_file):
@@ -360,4 +446,4 @@ class SearchService:
                 print(f"Error fetching prints: {e}")
                 callback([])
 
-        threading.Thread(target=_fetch, daemon=True).start()
+        self.engine.call(_fetch, host=prints_search_uri)
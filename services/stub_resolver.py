@@ -0,0 +1,238 @@
+import heapq
+import itertools
+import threading
+import time
+
+import requests
+
+from database import normalize_name
+from services.rate_limiter import request_priority, INTERACTIVE, BACKGROUND
+
+# Stub priorities, lowest value first
+SELECTED = 0  # the card the user just clicked
+VISIBLE = 1   # cards shown in the deck list
+DECK = 2      # the rest of an imported deck
+
+class StubResolver:
+    """
+    Resolves card stubs ({'name': ..., 'is_stub': True}) to full cards in
+    batches: first against the local database, then through Scryfall's
+    /cards/collection endpoint (75 names per request), then clear
+    misspellings of local names, and only the names left through one fuzzy
+    /cards/named lookup each. Offline, names are only matched locally.
+    Cards fetched from the API are saved to the database in one transaction.
+    Requests are spaced out by the session's rate limiter (see rate_limiter.py).
+
+    Pending stubs are handed to a few workers by priority, and stubs with the
+    same name (queued or already being fetched) share one lookup. Selected
+    cards skip the batch window.
+    """
+    API_BASE = "https://api.scryfall.com"
+    # Most identifiers /cards/collection accepts per request
+    COLLECTION_BATCH = 75
+    # How long to keep collecting stubs after the first one arrives
+    BATCH_WINDOW = 0.2
+    WORKERS = 3
+
+    def __init__(self, db, session, on_resolved, api_base=API_BASE):
+        """
+        on_resolved: function(stub, card), called on a resolver thread for
+        every stub that was found.
+        api_base: Scryfall API root; point it at a stand-in server for testing.
+        """
+        self.db = db
+        self.session = session if session else requests.Session()
+        self.on_resolved = on_resolved
+        self.api_base = api_base.rstrip('/')
+        self._cond = threading.Condition()
+        # name -> [priority, stubs] for names waiting for a worker
+        self._pending = {}
+        # name -> stubs for names a worker is looking up
+        self._in_flight = {}
+        # (priority, order, name); entries left behind by a priority bump are skipped
+        self._heap = []
+        self._counter = itertools.count()
+        self._window_start = None
+        for _ in range(self.WORKERS):
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def resolve(self, stub, priority=DECK):
+        """
+        Queues a stub. A stub whose name is already queued or being fetched
+        joins that lookup; queuing it again at a higher priority moves the
+        name up.
+        """
+        name = stub['name']
+        with self._cond:
+            stubs = self._in_flight.get(name)
+            if stubs is not None:
+                if not any(s is stub for s in stubs):
+                    stubs.append(stub)
+                return
+
+            entry = self._pending.get(name)
+            if entry is None:
+                self._pending[name] = [priority, [stub]]
+                if self._window_start is None:
+                    self._window_start = time.monotonic()
+            else:
+                if not any(s is stub for s in entry[1]):
+                    entry[1].append(stub)
+                if priority >= entry[0]:
+                    return
+                entry[0] = priority
+            heapq.heappush(self._heap, (priority, next(self._counter), name))
+            self._cond.notify_all()
+
+    def _take_batch(self):
+        """Waits for work and moves the next batch of names from pending to in flight."""
+        with self._cond:
+            while True:
+                self._drop_stale()
+                if self._heap:
+                    if self._heap[0][0] == SELECTED:
+                        break
+                    remaining = self._window_start + self.BATCH_WINDOW - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+
+            priority = self._heap[0][0]
+            names = []
+            while self._heap and len(names) < self.COLLECTION_BATCH:
+                # A click doesn't wait for a full collection request
+                if priority == SELECTED and self._heap[0][0] != SELECTED:
+                    break
+                _, _, name = heapq.heappop(self._heap)
+                names.append(name)
+                self._in_flight[name] = self._pending.pop(name)[1]
+                self._drop_stale()
+
+            if not self._pending:
+                self._window_start = None
+            return priority, names
+
+    def _drop_stale(self):
+        while self._heap:
+            entry_priority, _, name = self._heap[0]
+            entry = self._pending.get(name)
+            if entry is not None and entry[0] == entry_priority:
+                return
+            heapq.heappop(self._heap)
+
+    def _run(self):
+        while True:
+            priority, names = self._take_batch()
+            found = {}
+            try:
+                with request_priority(INTERACTIVE if priority == SELECTED else BACKGROUND):
+                    found = self._lookup(names)
+            except Exception as e:
+                print(f"Error resolving cards: {e}")
+
+            with self._cond:
+                delivered = [(name, self._in_flight.pop(name)) for name in names]
+            # A failing callback must not stop this worker or the other stubs
+            for name, stubs in delivered:
+                if name in found:
+                    for stub in stubs:
+                        try:
+                            self.on_resolved(stub, found[name])
+                        except Exception as e:
+                            print(f"Error updating {name}: {e}")
+
+            self._report_unresolved([name for name in names if name not in found])
+
+    def _lookup(self, names):
+        """
+        Finds cards locally, then through the API (saving what it fetched),
+        with clear local misspellings taken as soon as Scryfall has no exact
+        match for a name or can't be reached. Returns name -> card.
+        """
+        found = self.db.get_cards(names)
+        missing = [name for name in names if name not in found]
+        if not missing:
+            return found
+
+        fetched = {}
+        try:
+            # A fuzzy lookup also finds exact names, so a single name takes one request
+            if len(missing) > 1:
+                for start in range(0, len(missing), self.COLLECTION_BATCH):
+                    fetched.update(self._fetch_collection(missing[start:start + self.COLLECTION_BATCH]))
+                # Not exact card names as far as Scryfall knows, so a close
+                # local name can't be a newer card swapped for an older one
+                found.update(self.db.get_cards([name for name in missing if name not in fetched], fuzzy=True))
+
+            # Misspellings and alternate names get one fuzzy lookup each
+            for name in missing:
+                if name not in fetched and name not in found:
+                    card = self._fetch_fuzzy(name)
+                    if card:
+                        fetched[name] = card
+        except requests.ConnectionError as e:
+            # Offline: every other request would fail the same way
+            print(f"Scryfall unreachable, matching names locally: {e}")
+
+        if fetched:
+            # One card can answer several requested names (e.g. both faces)
+            unique = {card['name']: card for card in fetched.values()}
+            self.db.save_cards(list(unique.values()))
+        found.update(fetched)
+
+        leftovers = [name for name in missing if name not in found]
+        if leftovers:
+            found.update(self.db.get_cards(leftovers, fuzzy=True))
+        return found
+
+    def _report_unresolved(self, names):
+        for name in names:
+            candidates = self.db.find_similar_names(name, limit=3)
+            if candidates:
+                print(f"Could not find card: {name} (closest: {', '.join(c for _, c in candidates)})")
+            else:
+                print(f"Could not find card: {name}")
+
+    def _fetch_collection(self, names):
+        try:
+            response = self.session.post(f"{self.api_base}/cards/collection",
+                                         json={'identifiers': [{'name': name} for name in names]},
+                                         timeout=30)
+            if response.status_code != 200:
+                print(f"Card collection request failed: {response.status_code}")
+                return {}
+            cards = response.json().get('data', [])
+        except requests.ConnectionError:
+            raise
+        except Exception as e:
+            print(f"Error fetching card collection: {e}")
+            return {}
+
+        # Scryfall matches names loosely (case, front faces of split and
+        # double-faced cards), so map the cards back by normalized name
+        by_key = {}
+        for card in cards:
+            card_name = card.get('name', '')
+            by_key.setdefault(normalize_name(card_name), card)
+            for face in card_name.split(' // '):
+                by_key.setdefault(normalize_name(face), card)
+
+        results = {}
+        for name in names:
+            card = by_key.get(normalize_name(name))
+            if card:
+                results[name] = card
+        return results
+
+    def _fetch_fuzzy(self, name):
+        try:
+            response = self.session.get(f"{self.api_base}/cards/named", params={'fuzzy': name}, timeout=10)
+            if response.status_code == 200:
+                return response.json()
+        except requests.ConnectionError:
+            raise
+        except Exception as e:
+            print(f"Error fetching {name}: {e}")
+        return None
@@ -4,8 +4,6 @@ import customtkinter as ctk
 from ui.widgets import BaseWindow, BaseToplevel, Button, Label, Frame, Entry, CheckBox, ComboBox, ScrollableFrame, set_appearance_mode, set_default_color_theme
 import requests
 import threading
-import queue
-import time
 import json
 import os
 import re
@@ -18,6 +16,10 @@ from services.image_service import ImageService
 from services.search_service import SearchService
 from services.edhrec_service import EDHRecService
 from services.data_updater import DataUpdater
+from services.name_index import NameIndex
+from services.stub_resolver import StubResolver, SELECTED, VISIBLE, DECK
+from services.http_cache import HttpCache, install_http_cache
+from services.fetch_engine import FetchEngine
 from services.deck_service import DeckService
 from services.legality_service import LegalityService
 from ui.panels.search_panel import SearchPanel
@@ -43,6 +45,8 @@ class MTGDeckBuilder(BaseWindow):
 
         self.deck = []
         self.commander = None
+        # Stub clicked in the search results, shown once it's resolved
+        self._selected_stub = None
         
         self.db = CardDatabase()
 
@@ -52,9 +56,15 @@ class MTGDeckBuilder(BaseWindow):
             'User-Agent': 'EDHRecBuilder/1.0',
             'Accept': 'application/json;q=0.9,*/*;q=0.8'
         })
+        # On-disk response cache and per-host request limits, shared by
+        # every service using the session
+        self.http_cache = HttpCache()
+        install_http_cache(self.session, self.http_cache)
         
         # Services
-        self.image_loader = ImageService(self.session)
+        # One event loop thread schedules image and card fetches for the app
+        self.fetch_engine = FetchEngine(self.session)
+        self.image_loader = ImageService(self.session, self.fetch_engine)
         self.edhrec_service = EDHRecService(self.session)
         self.data_updater = DataUpdater(self.db, self.session)
         self.deck_service = DeckService()
@@ -75,17 +85,28 @@ class MTGDeckBuilder(BaseWindow):
             ("Marvel", "ub_marvel", ["mar"]),
         ]
         
-        self.search_service = SearchService(self.db, self.session, self.ub_sets_config)
+        # Card names for search-as-you-type, reloaded whenever an update changes the database
+        self.name_index = NameIndex(self.db)
+        self.data_updater.add_listener(self.name_index.load)
+
+        self.search_service = SearchService(self.db, self.session, self.ub_sets_config, self.fetch_engine,
+                                           self.name_index)
+        # Cached search results are stale once an update changed the database
+        self.data_updater.add_listener(self.search_service.clear_cache)
         
-        # Fetching Queue for rate limiting
-        self.fetch_queue = queue.Queue()
-        threading.Thread(target=self._process_fetch_queue, daemon=True).start()
+        # Resolves stub cards (local database, then Scryfall) in batches
+        self.stub_resolver = StubResolver(
+            self.db, self.session,
+            lambda stub, card: self.after(0, lambda: self._replace_stub_in_results(stub, card)))
 
         self.create_menu()
         self.create_widgets()
         
         # Startup tasks in background (After widgets created so status bar exists)
         def startup_tasks():
+            self.after(0, lambda: self.status_var.set("Loading card names..."))
+            self.name_index.load()
+
             self.after(0, lambda: self.status_var.set("Updating banlist..."))
             self.legality_service.update_banlist()
             
@@ -225,12 +246,14 @@ class MTGDeckBuilder(BaseWindow):
     # --- Event Handlers ---
 
     def on_search_result_select(self, card):
+        self._selected_stub = None
         if card.get('is_stub'):
             # Show loading in details
             # self.details_panel.display_loading() # TODO: Add this method
-            if not card.get('fetching'):
-                card['fetching'] = True
-                self.fetch_queue.put(card)
+            # Jumps ahead of anything queued, even if this stub already is
+            card['fetching'] = True
+            self._selected_stub = card
+            self.stub_resolver.resolve(card, SELECTED)
         else:
             self.details_panel.display_card(card)
 
@@ -281,7 +304,7 @@ class MTGDeckBuilder(BaseWindow):
             
         VersionsDialog(self, card, self.search_service, self.image_loader, on_version_selected, action_label="Update Version")
 
-    def _add_single_card(self, card):
+    def _add_single_card(self, card, fetch_latest=True, priority=VISIBLE):
         card_name = card.get('name')
         type_line = card.get('type_line', '')
 
@@ -310,10 +333,12 @@ class MTGDeckBuilder(BaseWindow):
         # Prepare card for deck
         # If it's a full card (from search), copy it and mark as stub to force fetch of latest version
         # This ensures we always use the latest version unless explicitly changed later
+        # Cards resolved from the local DB are already the latest version (fetch_latest=False)
         if not card.get('is_stub'):
              card = card.copy()
-             card['is_stub'] = True
-             card['fetching'] = False
+             if fetch_latest:
+                 card['is_stub'] = True
+                 card['fetching'] = False
         
         # Mark as default version so UI hides set info
         card['is_default_version'] = True
@@ -324,7 +349,7 @@ class MTGDeckBuilder(BaseWindow):
         # Queue fetch
         if card.get('is_stub') and not card.get('fetching'):
              card['fetching'] = True
-             self.fetch_queue.put(card)
+             self.stub_resolver.resolve(card, priority)
              
         return True, None
 
@@ -383,6 +408,11 @@ class MTGDeckBuilder(BaseWindow):
         if error:
             self.after(0, lambda: self.search_panel.set_results([{'name': error, 'is_stub': True}]))
         else:
+            # Resolve the whole list against the commander's legal pool in one
+            # pass; cards missing locally stay stubs and are fetched on demand
+            identity = self.commander.get('color_identity', []) if self.commander else None
+            local_cards = self.db.get_cards([rec['name'] for rec in recs], identity=identity)
+            recs = [local_cards.get(rec['name'], rec) for rec in recs]
             self.after(0, lambda: self.search_panel.set_results(recs))
 
     def open_preview(self):
@@ -469,46 +499,6 @@ class MTGDeckBuilder(BaseWindow):
 
     # --- Data Fetching Logic (Stubs) ---
 
-    def _process_fetch_queue(self):
-        while True:
-            card_stub = self.fetch_queue.get()
-            try:
-                used_api = self._fetch_and_display_stub(card_stub)
-                if used_api:
-                    time.sleep(0.1) 
-            except Exception as e:
-                print(f"Queue error: {e}")
-            finally:
-                self.fetch_queue.task_done()
-
-    def _fetch_and_display_stub(self, card_stub):
-        name = card_stub['name']
-        
-        # Try local DB first
-        local_card = self.db.get_card(name)
-        if local_card:
-            self.after(0, lambda: self._replace_stub_in_results(card_stub, local_card))
-            return False
-
-        try:
-            response = self.session.get("https://api.scryfall.com/cards/named", params={'exact': name})
-            if response.status_code == 200:
-                full_card = response.json()
-                self.db.save_card(full_card)
-                self.after(0, lambda: self._replace_stub_in_results(card_stub, full_card))
-                return True
-            elif response.status_code == 404:
-                response = self.session.get("https://api.scryfall.com/cards/named", params={'fuzzy': name})
-                if response.status_code == 200:
-                    full_card = response.json()
-                    self.db.save_card(full_card)
-                    self.after(0, lambda: self._replace_stub_in_results(card_stub, full_card))
-                    return True
-                    
-        except Exception as e:
-            print(f"Error fetching stub: {e}")
-        return False
-
     def _replace_stub_in_results(self, stub, full_card):
         try:
             stub.update(full_card)
@@ -520,15 +510,10 @@ class MTGDeckBuilder(BaseWindow):
             # Refresh deck panel to show updated name/info
             self.deck_panel.refresh_deck(self.deck)
             
-            # Refresh display if selected
-            # We need to check if this card is currently selected in SearchPanel
-            # SearchPanel doesn't expose selection easily, but we can check if DetailsPanel is showing it?
-            # Actually, if we update the object in place, and then call display_card again if it matches...
-            
-            # For now, let's just rely on user re-clicking or if we can trigger a refresh.
-            # If we are currently viewing this card:
-            # We can't easily know.
-            pass 
+            # Show the card if it's still the one the user clicked
+            if stub is self._selected_stub:
+                self._selected_stub = None
+                self.details_panel.display_card(stub)
         except Exception as e:
             print(f"Error replacing stub: {e}")
 
@@ -611,19 +596,20 @@ class MTGDeckBuilder(BaseWindow):
             os.makedirs(cache_dir)
             
         generator = self.db.get_all_cards_generator()
-        
-        i = 0
-        for i, card in enumerate(generator):
-            if self.stop_download:
-                break
-                
-            if i % 50 == 0:
-                self.after(0, lambda c=i, t=total_count, n=card.get('name'): self._update_dl_progress(c, t, n))
-            
-            urls = self.image_loader.get_card_image_urls(card)
-            for url in urls:
-                self.image_loader.download_image_to_cache(url)
-            
+        processed = [0]
+
+        def image_urls():
+            for i, card in enumerate(generator):
+                processed[0] = i
+                if i % 50 == 0:
+                    self.after(0, lambda c=i, t=total_count, n=card.get('name'): self._update_dl_progress(c, t, n))
+                yield from self.image_loader.get_card_image_urls(card)
+
+        # Downloads run several at a time on the fetch engine, behind
+        # anything the user is waiting for
+        self.image_loader.download_images(image_urls(), should_stop=lambda: self.stop_download)
+        i = processed[0]
+
         self.after(0, self.progress_window.destroy)
         if self.stop_download:
              self.after(0, lambda: messagebox.showinfo("Stopped", f"Download stopped.\nProcessed: {i} cards"))
@@ -657,12 +643,13 @@ class MTGDeckBuilder(BaseWindow):
             
         total = len(cards)
         
-        for i, card in enumerate(cards):
-            self.after(0, lambda i=i, name=card.get('name'): self._update_dl_progress(i, total, name))
-            urls = self.image_loader.get_card_image_urls(card)
-            for url in urls:
-                self.image_loader.download_image_to_cache(url)
-            
+        def image_urls():
+            for i, card in enumerate(cards):
+                self.after(0, lambda i=i, name=card.get('name'): self._update_dl_progress(i, total, name))
+                yield from self.image_loader.get_card_image_urls(card)
+
+        self.image_loader.download_images(image_urls())
+
         self.after(0, self.progress_window.destroy)
         self.after(0, lambda: messagebox.showinfo("Complete", "Image download complete."))
 
@@ -824,10 +811,17 @@ class MTGDeckBuilder(BaseWindow):
         
         added_count = 0
         errors = []
+
+        # Resolve the whole list against the local DB in one query;
+        # only names missing locally are queued for the API
+        local_cards = self.db.get_cards(card_names)
         
         for card_name in card_names:
-            card_stub = {'name': card_name, 'is_stub': True}
-            success, msg = self._add_single_card(card_stub)
+            if card_name in local_cards:
+                success, msg = self._add_single_card(local_cards[card_name], fetch_latest=False)
+            else:
+                card_stub = {'name': card_name, 'is_stub': True}
+                success, msg = self._add_single_card(card_stub, priority=DECK)
             if success:
                 added_count += 1
             elif msg:
@@ -844,16 +838,29 @@ class MTGDeckBuilder(BaseWindow):
             return
             
         try:
-            # Delete files
-            if os.path.exists("cards.db"):
-                try:
-                    os.remove("cards.db")
-                except PermissionError:
-                    messagebox.showerror("Error", "Cannot delete database file. It might be in use.")
-                    return
+            # Delete files. Pooled connections keep the database open, and
+            # WAL mode keeps its -wal/-shm files (and an interrupted update
+            # its .new copy) next to it.
+            self.db.close()
+            db_path = self.db.db_path
+            for path in (db_path, db_path + "-wal", db_path + "-shm", db_path + ".new",
+                         db_path + ".new-wal", db_path + ".new-shm", db_path + ".new-journal"):
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except PermissionError:
+                        messagebox.showerror("Error", "Cannot delete database file. It might be in use.")
+                        return
 
             if os.path.exists("creature_types.json"):
                 os.remove("creature_types.json")
+
+            self.http_cache.clear()
+
+            # Bulk data version info and any partial download
+            for path in (self.data_updater.state_file, self.data_updater.download_path):
+                if os.path.exists(path):
+                    os.remove(path)
                 
             if os.path.exists("image_cache"):
                 shutil.rmtree("image_cache")
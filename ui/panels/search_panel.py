@@ -16,6 +16,14 @@ class SearchPanel(Frame):
         
         self.current_search_results = []
         self.creature_types = [] # Cache for types
+        self._suggest_job = None
+        self._last_suggest_query = None
+        # Bumped whenever the results list is replaced; a search only shows
+        # its results if nothing replaced the list since it started
+        self._search_seq = 0
+        # Where the shown results continue (see SearchService.load_more), if they do
+        self._next_page = None
+        self._loading_more = False
         self.search_prefs = {
             'include_alchemy': tk.BooleanVar(value=False),
             'include_silver': tk.BooleanVar(value=False),
@@ -44,6 +52,7 @@ class SearchPanel(Frame):
         self.search_entry = Entry(search_frame, textvariable=self.search_var)
         self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         self.search_entry.bind('<Return>', lambda e: self.perform_search())
+        self.search_entry.bind('<KeyRelease>', self._on_search_key)
         
         search_btn = Button(search_frame, text="Search", command=self.perform_search, width=80)
         search_btn.pack(side=tk.RIGHT, padx=5)
@@ -111,23 +120,80 @@ class SearchPanel(Frame):
 
         # --- Results List ---
         # Using standard Listbox for now as CTk doesn't have a direct replacement
-        self.results_list = tk.Listbox(self, selectmode=tk.EXTENDED)
+        self.results_list = tk.Listbox(self, selectmode=tk.EXTENDED, yscrollcommand=self._on_results_scroll)
         self.results_list.pack(fill=tk.BOTH, expand=True, pady=5, padx=5)
         self.results_list.bind('<<ListboxSelect>>', self._on_list_select)
         self.results_list.bind('<Double-1>', lambda e: self.on_card_double_click())
 
+    def _on_search_key(self, event):
+        if event.keysym == 'Return':
+            return
+        # Only the last of several quick keystrokes runs a lookup
+        if self._suggest_job:
+            self.after_cancel(self._suggest_job)
+        self._suggest_job = self.after(30, self._search_as_you_type)
+
+    def _search_as_you_type(self):
+        self._suggest_job = None
+        query = self.search_var.get().strip()
+        if not query or query == self._last_suggest_query:
+            return
+
+        filters = self._gather_filters(warn=False)
+        if filters is None:
+            return
+        # Keys that don't change the text (arrows, Shift, Ctrl+C) suggest nothing new
+        self._last_suggest_query = query
+        # Suggestions replace a search still running, like a new search would
+        seq = self._search_seq + 1
+        if not self.search_service.suggest(
+                query, filters, lambda status_code, data: self.after(0, lambda: self._show_suggestions(seq, data))):
+            return
+        self._search_seq = seq
+
+    def _show_suggestions(self, seq, data):
+        if seq != self._search_seq:
+            return
+        self._update_results_ui(200, data)
+
     def perform_search(self):
         query = self.search_var.get().strip()
+        # A full search replaces the suggestions: drop a pending suggestion,
+        # and only suggest again once the text changes
+        if self._suggest_job:
+            self.after_cancel(self._suggest_job)
+            self._suggest_job = None
+        self._last_suggest_query = query
+
+        filters = self._gather_filters()
+        if filters is None:
+            return
+
+        self.results_list.delete(0, tk.END)
+        self.results_list.insert(tk.END, "Searching...")
+        self._next_page = None
 
-        # Gather filters
+        self._search_seq += 1
+        seq = self._search_seq
+        self.search_service.search(query, filters,
+                                   lambda status_code, data: self._on_search_complete(seq, status_code, data))
+
+    def _supersede_search(self):
+        # Keeps a search still running from overwriting what is shown now
+        self._search_seq += 1
+        self.search_service.cancel()
+
+    def _gather_filters(self, warn=True):
+        """Returns the filters dict for the current settings, or None if they are unusable."""
         filters = {}
         
         # Commander Identity
         if self.filter_commander_identity.get():
             commander = self.get_commander_callback()
             if not commander:
-                messagebox.showwarning("Commander Search", "Please set a commander first to use Commander Identity filter.")
-                return
+                if warn:
+                    messagebox.showwarning("Commander Search", "Please set a commander first to use Commander Identity filter.")
+                return None
             filters['commander_identity'] = commander.get('color_identity', [])
 
         # Colors
@@ -160,29 +226,61 @@ class SearchPanel(Frame):
         for key, var in self.search_prefs.items():
             prefs[key] = var.get()
         filters['prefs'] = prefs
+        return filters
 
-        self.results_list.delete(0, tk.END)
-        self.results_list.insert(tk.END, "Searching...")
-        
-        self.search_service.search(query, filters, self._on_search_complete)
+    def _on_search_complete(self, seq, status_code, data):
+        # Service calls callback from its thread, so schedule the UI update
+        self.after(0, lambda: self._show_search_results(seq, status_code, data))
 
-    def _on_search_complete(self, status_code, data):
-        # This should be called on main thread via after() in service or here?
-        # Service calls callback from thread. We need to schedule UI update.
-        self.after(0, lambda: self._update_results_ui(status_code, data))
+    def _show_search_results(self, seq, status_code, data):
+        # A newer search or list replaced this one while it ran
+        if seq != self._search_seq:
+            return
+        self._update_results_ui(status_code, data)
 
     def _update_results_ui(self, status_code, data):
         self.current_search_results = []
         self.results_list.delete(0, tk.END)
+        self._set_next_page(status_code, data)
 
         if status_code == 200:
-            cards = data.get('data', [])
-            for card in cards:
-                self.current_search_results.append(card)
-                self.results_list.insert(tk.END, card.get('name'))
+            self._append_cards(data.get('data', []))
         else:
             self.results_list.insert(tk.END, "No results found")
 
+    def _set_next_page(self, status_code, data):
+        self._loading_more = False
+        if status_code == 200 and data.get('has_more'):
+            self._next_page = data.get('next_page')
+        else:
+            self._next_page = None
+
+    def _append_cards(self, cards):
+        self.current_search_results.extend(cards)
+        self.results_list.insert(tk.END, *(card.get('name') for card in cards))
+
+    def _on_results_scroll(self, first, last):
+        # Fetch the next page once the end of the list comes into view
+        if float(last) >= 0.95:
+            self._load_more()
+
+    def _load_more(self):
+        if not self._next_page or self._loading_more:
+            return
+        self._loading_more = True
+        seq = self._search_seq
+        self.search_service.load_more(
+            self._next_page,
+            lambda status_code, data: self.after(0, lambda: self._show_more_results(seq, status_code, data)))
+
+    def _show_more_results(self, seq, status_code, data):
+        # The list was replaced while this page loaded
+        if seq != self._search_seq:
+            return
+        self._set_next_page(status_code, data)
+        if status_code == 200:
+            self._append_cards(data.get('data', []))
+
     def _on_list_select(self, event):
         selection = self.results_list.curselection()
         if selection:
@@ -200,6 +298,9 @@ class SearchPanel(Frame):
         return cards
 
     def set_results(self, cards):
+        self._supersede_search()
+        self._next_page = None
+        self._loading_more = False
         self.current_search_results = cards
         self.results_list.delete(0, tk.END)
         for card in cards: